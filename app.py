@@ -1,12 +1,35 @@
+import time
+
+# Startup time is printed once the module has loaded, see the bottom of the file
+import_started = time.perf_counter()
+
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-from collections import Counter
 
+import json
 import os
+import threading
 import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State
+from flask import request
+
+from background_jobs import BackgroundJobs, QueueFull
+from data_store import (CHECKS_PATH, MOVESET_STORE_PATH, SHARED_DATASET_PATH, TEAMMATES_PATH, USAGE_STORE_PATH,
+                        attach_shared_dataset, dataset_version, join_species, load_insights, load_movers,
+                        load_usage_tables, lock_file, shared_dataset_version, write_moveset_store_from_csv,
+                        write_shared_dataset)
+from fetcher import RateLimiter
+from insights import compute_insights, index_insights
+from figure_cache import FigureCache
+from moveset_index import MovesetIndex
+from movers import compute_movers, index_movers
+from species_index import SpeciesIndex
+from sprite_cache import SPRITE_URL_PATH, SpriteCache
+from summary_cache import SummaryCache
+from usage_index import AGGREGATIONS, UsageIndex, aggregate_usage, fill_missing_months
 
 app = dash.Dash(__name__)
 app.title = 'PokeInsights'
@@ -17,9 +40,173 @@ colors = {
     'background_color': '#404040',
     'text': '#FFFFFF'
 }
-df_final = pd.read_excel("sample_data.xlsx")
-df_teammates = pd.read_csv("smogon_teammates_data.csv")
-df_checks = pd.read_csv("smogon_checks_data.csv")
+# Set SHARED_DATASET=1 when running several workers: they all memory-map one copy of the data written by the
+# scraper (see data_store.write_shared_dataset) instead of each loading their own, and pick up new versions live
+shared_dataset = bool(os.environ.get('SHARED_DATASET'))
+# Seconds between checks for a new shared dataset version
+SHARED_DATASET_POLL = 30
+# Serialized line graphs, cleared whenever a different dataset version is loaded
+figure_cache = FigureCache()
+# Line graphs with this many Pokémon are drawn with WebGL (scattergl), SVG gets slow on phones
+WEBGL_TRACES = 25
+# The tier the page opens on. Without the shared dataset it's read on its own first so the server can start
+# answering, and the other tiers are read in the background.
+DEFAULT_TIER = 'gen9ou'
+# Set once every tier is loaded
+all_tiers_loaded = threading.Event()
+# Set once the background load of the other tiers is over, whether it worked or not
+tier_load_finished = threading.Event()
+all_tiers_lock = threading.Lock()
+# Seconds a callback for another tier waits on the background load before answering without that tier's data
+TIER_LOAD_WAIT = 30
+
+
+def load_dataset(tiers=None):
+    # (usage rows, species, version), only the given tiers' rows if tiers is set. A partial load gets its own
+    # version so figures cached from it are dropped once every tier is loaded.
+    if not shared_dataset:
+        version = dataset_version()
+        return (*load_usage_tables(tiers=tiers), version if tiers is None else (version, tuple(tiers)))
+    dataset = attach_shared_dataset()
+    if dataset is None:
+        # Nothing scraped in this format yet, the first worker up converts the usage store and the others wait
+        # to attach what it wrote
+        with lock_file(SHARED_DATASET_PATH):
+            dataset = attach_shared_dataset()
+            if dataset is None:
+                write_shared_dataset(*load_usage_tables())
+                dataset = attach_shared_dataset()
+    return dataset
+
+
+def activate_dataset(dataset):
+    # Builds everything the callbacks read from a dataset, then switches them all over to it
+    global df_final, species, usage_index, species_index, insights, movers
+    new_df, new_species, version = dataset
+    new_index = UsageIndex(new_df)
+    new_species_index = SpeciesIndex(new_species)
+    # "Interesting Insights" per (Tier, Ranking, Month), precomputed by the scraper when it can be
+    insights_table = load_insights()
+    if insights_table is None:
+        insights_table = compute_insights(join_species(new_df, new_species, ['Type1', 'Type2', 'BST']))
+    # Month-over-month changes for the meta summary, also written by the scraper
+    movers_table = load_movers()
+    if movers_table is None:
+        movers_table = compute_movers(new_df)
+    df_final, species, usage_index, insights = new_df, new_species, new_index, index_insights(insights_table)
+    species_index, movers = new_species_index, index_movers(movers_table)
+    figure_cache.set_version(version)
+
+
+def load_remaining_tiers():
+    # Runs in the background at startup, and again from a callback if that failed
+    with all_tiers_lock:
+        if all_tiers_loaded.is_set():
+            return
+        begin = time.perf_counter()
+        try:
+            activate_dataset(load_dataset())
+            all_tiers_loaded.set()
+            print(f"Loaded every tier in {time.perf_counter() - begin:.2f}s")
+        except Exception as e:
+            print(f"Loading every tier failed: {e}")
+        finally:
+            tier_load_finished.set()
+
+
+def wait_for_tier(tier):
+    # Callbacks for anything but the default tier may come in before the background load is done. If it
+    # failed, or there's no loader thread in this process, the callback loads every tier itself. Past
+    # TIER_LOAD_WAIT it answers with what is loaded so far, as if the tier had no data.
+    if tier == DEFAULT_TIER or all_tiers_loaded.is_set():
+        return
+    if tier_loader.is_alive() and not tier_load_finished.wait(TIER_LOAD_WAIT):
+        return
+    load_remaining_tiers()
+
+
+def reset_tier_load():
+    # gunicorn --preload forks the workers after import and the loader thread doesn't come along (it may even
+    # hold the lock), so a worker without every tier loads them on first use
+    global all_tiers_lock
+    all_tiers_lock = threading.Lock()
+
+
+def watch_shared_dataset():
+    while True:
+        time.sleep(SHARED_DATASET_POLL)
+        # Keeps serving the current version if the new one can't be read, e.g. it was replaced again in between
+        try:
+            if shared_dataset_version() in (None, figure_cache.version):
+                continue
+            dataset = attach_shared_dataset()
+            if dataset is not None:
+                activate_dataset(dataset)
+                print(f"Switched to shared dataset version {figure_cache.version}")
+        except Exception as e:
+            print(f"Switching shared dataset version failed, trying again later: {e}")
+
+
+# df_final holds the usage rows and species the sprite links, types and base stats once per Pokémon (indexed
+# by Name). usage_index splits df_final per (Tier, Ranking) for the dropdown callbacks, species_index has the
+# stats box figure of every Pokémon.
+if shared_dataset:
+    # Mapping the shared dataset is cheap, every tier is there from the start
+    activate_dataset(load_dataset())
+    all_tiers_loaded.set()
+    # Each worker polls on its own, so start workers without gunicorn's --preload (threads don't survive a fork)
+    threading.Thread(target=watch_shared_dataset, daemon=True).start()
+elif not os.path.exists(USAGE_STORE_PATH):
+    # The Excel export can't be read a tier at a time, so it's read once with every tier
+    activate_dataset(load_dataset())
+    all_tiers_loaded.set()
+else:
+    activate_dataset(load_dataset([DEFAULT_TIER]))
+    tier_loader = threading.Thread(target=load_remaining_tiers, daemon=True)
+    tier_loader.start()
+    os.register_at_fork(after_in_child=reset_tier_load)
+# Abilities, items, spreads, moves, tera types, teammates and checks, loaded a tier at a time when first clicked
+moveset_index = MovesetIndex()
+
+
+def prepare_moveset_index():
+    # Deployments scraped before the moveset store existed only have the teammates/checks CSVs. Until they're
+    # converted the Pokemon panels show no moveset tables. One worker converts them, the others wait for it.
+    if not os.path.exists(MOVESET_STORE_PATH) and os.path.exists(TEAMMATES_PATH) and os.path.exists(CHECKS_PATH):
+        with lock_file(MOVESET_STORE_PATH):
+            if not os.path.exists(MOVESET_STORE_PATH):
+                write_moveset_store_from_csv(TEAMMATES_PATH, CHECKS_PATH)
+    # Index the default tier so the first click doesn't wait on disk
+    moveset_index.load_tier(DEFAULT_TIER)
+
+
+threading.Thread(target=prepare_moveset_index, daemon=True).start()
+
+top_n_options = [
+    {'label': 'Top 5 Results', 'value': 5},
+    {'label': 'Top 10 Results', 'value': 10},
+    {'label': 'Top 25 Results', 'value': 25}
+]
+aggregation_options = [{'label': 'Monthly', 'value': 'month'}] + [
+    {'label': label, 'value': value} for value, label in AGGREGATIONS.items()
+]
+tier_options = [
+    {'label': 'GEN9OU', 'value': 'gen9ou'},
+    {'label': 'GEN9UBERS', 'value': 'gen9ubers'},
+    {'label': 'GEN9UU', 'value': 'gen9uu'},
+    {'label': 'GEN9RU', 'value': 'gen9ru'},
+    {'label': 'GEN9NU', 'value': 'gen9nu'},
+    {'label': 'GEN9PU', 'value': 'gen9pu'},
+    {'label': 'GEN9ZU', 'value': 'gen9zu'},
+    {'label': 'GEN8OU', 'value': 'gen8ou'},
+    {'label': 'GEN7OU', 'value': 'gen7ou'},
+    {'label': 'GEN6OU', 'value': 'gen6ou'},
+    {'label': 'GEN5OU', 'value': 'gen5ou'},
+    {'label': 'GEN4OU', 'value': 'gen4ou'},
+    {'label': 'GEN3OU', 'value': 'gen3ou'},
+    {'label': 'GEN2OU', 'value': 'gen2ou'},
+    {'label': 'GEN1OU', 'value': 'gen1ou'},
+]
 
 app.layout = html.Div(
     style={'backgroundColor': colors['background_color'], 'color': colors['text'], 'height': '100vh',
@@ -62,11 +249,7 @@ app.layout = html.Div(
         ),
         dcc.Dropdown(
             id='top-n-results',
-            options=[
-                {'label': 'Top 5 Results', 'value': 5},
-                {'label': 'Top 10 Results', 'value': 10},
-                {'label': 'Top 25 Results', 'value': 25}
-            ],
+            options=top_n_options,
             value=5,  # Default Value
             searchable=False,
             clearable=False,
@@ -76,23 +259,7 @@ app.layout = html.Div(
             },
         ), dcc.Dropdown(
             id='tier-dropdown',
-            options=[
-                {'label': 'GEN9OU', 'value': 'gen9ou'},
-                {'label': 'GEN9UBERS', 'value': 'gen9ubers'},
-                {'label': 'GEN9UU', 'value': 'gen9uu'},
-                {'label': 'GEN9RU', 'value': 'gen9ru'},
-                {'label': 'GEN9NU', 'value': 'gen9nu'},
-                {'label': 'GEN9PU', 'value': 'gen9pu'},
-                {'label': 'GEN9ZU', 'value': 'gen9zu'},
-                {'label': 'GEN8OU', 'value': 'gen8ou'},
-                {'label': 'GEN7OU', 'value': 'gen7ou'},
-                {'label': 'GEN6OU', 'value': 'gen6ou'},
-                {'label': 'GEN5OU', 'value': 'gen5ou'},
-                {'label': 'GEN4OU', 'value': 'gen4ou'},
-                {'label': 'GEN3OU', 'value': 'gen3ou'},
-                {'label': 'GEN2OU', 'value': 'gen2ou'},
-                {'label': 'GEN1OU', 'value': 'gen1ou'},
-            ],
+            options=tier_options,
             style={
                 'width': '150px',
                 'font-family': 'Roboto, sans-serif',
@@ -108,6 +275,24 @@ app.layout = html.Div(
             clearable=False,
             style={'width': '150px', 'font-family': 'Roboto, sans-serif'}
         ),
+        # Empty means every month, the graph is cut to the range on the server
+        dcc.DatePickerRange(
+            id='date-range',
+            min_date_allowed=df_final['Month'].min(),
+            max_date_allowed=df_final['Month'].max(),
+            display_format='MMM YYYY',
+            start_date_placeholder_text='From',
+            end_date_placeholder_text='To',
+            clearable=True,
+            style={'font-family': 'Roboto, sans-serif'}
+        ), dcc.Dropdown(
+            id='aggregation',
+            options=aggregation_options,
+            value='month',  # Default Value
+            searchable=False,
+            clearable=False,
+            style={'width': '200px', 'font-family': 'Roboto, sans-serif'}
+        ),
         dcc.Graph(id='line-graph', className='center dash-graph', responsive=True),
         html.Div([
             html.H4(id='selected-name', style={'font-family': 'Roboto, '
@@ -123,6 +308,22 @@ app.layout = html.Div(
                   'border': '2px solid white', 'padding': '10px', 'backgroundColor': '#111111',
                   'width': '800px', 'height': '450px', 'marginTop': '50px'},
             className='center dash-zoom'),
+        html.Div(id='moveset-info', style={
+            'display': 'flex',
+            'flexWrap': 'wrap',
+            'justifyContent': 'center',
+            'gap': '20px',
+            'marginTop': '30px',
+            'font-family': 'Roboto, sans-serif'
+        }),
+        html.Div(id='teammates-checks', style={
+            'display': 'flex',
+            'flexWrap': 'wrap',
+            'justifyContent': 'center',
+            'gap': '40px',
+            'marginTop': '30px',
+            'font-family': 'Roboto, sans-serif'
+        }),
         html.Div(id='conditional-text', style= {
             'clear': 'both',
             'paddingTop': '30px',
@@ -145,7 +346,10 @@ app.layout = html.Div(
                     'margin': '20px auto',
                     'maxWidth': '800px'
                 })
-            )
+            ),
+            # The summary is generated in the background, these track the job and poll until it's done
+            dcc.Store(id='ai-summary-job'),
+            dcc.Interval(id='ai-summary-poll', interval=1000, disabled=True)
         ], className='ai-analysis-section'),
         html.Div([
             html.P('v1.1'),
@@ -189,45 +393,17 @@ def update_ladder_ranking_options(selected_tier):
 
     return options, default_value
 
-def fill_missing_months(df, top_n_array):
-    df['Month'] = pd.to_datetime(df['Month'])
-    all_months = pd.date_range(df['Month'].min(), df['Month'].max(), freq='MS')
-    result = []
-    for name in top_n_array:
-        group = df[df['Name'] == name].set_index('Month').reindex(all_months, fill_value=0).reset_index()
-        group['Name'] = name
-        # Copy over other columns if needed (e.g., 'Sprite Links')
-        for col in ['Sprite Links', 'Ranking', 'Tier']:
-            if col in df.columns:
-                group[col] = df[df['Name'] == name][col].iloc[0] if not df[df['Name'] == name][col].empty else None
-        result.append(group)
-    df_filled = pd.concat(result)
-    df_filled.rename(columns={'index': 'Month'}, inplace=True)
-    return df_filled
-
-# Callback to update the graph
-@app.callback(
-    Output('line-graph', 'figure'),
-    [Input('tier-dropdown', 'value'),
-     Input('top-n-results', 'value'),
-     Input('ladder-ranking', 'value')]
-)
-def update_graph(given_tier, top_n, ladder_ranking):
-    # Filter df_final by the selected tier and ladder ranking
-    filtered_df = df_final[(df_final['Tier'] == given_tier) & (df_final['Ranking'] == ladder_ranking)]
-    if filtered_df.empty:
-        print("No data avaliable for tier: {'given_tier} in filtered_df!")
+def build_usage_graph(given_tier, top_n, ladder_ranking, start_month=None, end_month=None, aggregation='month'):
+    wait_for_tier(given_tier)
+    # Look up the selected tier and ladder ranking, already sorted by Month and Usage Rate, and only keep the
+    # months in the selected date range so the figure doesn't carry the rest
+    sorted_df = usage_index.window(given_tier, ladder_ranking, start_month, end_month)
+    if sorted_df is None or sorted_df.empty:
+        print(f"No data avaliable for tier: {given_tier} in filtered_df!")
         return px.line(title=f'Top {top_n} Results')
 
-    filtered_df['Month'] = pd.to_datetime(filtered_df['Month'])
-    # Sort by Month and Usage Rate
-    sorted_df = filtered_df.sort_values(by=['Month', 'Usage Rate'], ascending=[True, False])
-
-    # Identify the latest month
-    latest_month = sorted_df['Month'].max()
-
-    # Get the top N Pokémon for the latest month
-    latest_top_n = sorted_df[sorted_df['Month'] == latest_month].nlargest(top_n, 'Usage Rate')
+    # Get the top N Pokémon for the latest month in the range
+    latest_top_n = usage_index.top_n(given_tier, ladder_ranking, top_n, sorted_df['Month'].iloc[-1])
     top_n_array = latest_top_n['Name'].unique()
 
     # Filter the DataFrame to include only those top n Pokémon across all months
@@ -237,9 +413,15 @@ def update_graph(given_tier, top_n, ladder_ranking):
         print(f"No data available for the top {top_n} Pokémon in tier: {given_tier} in concat_df!")
         return px.line(title=f'Top {top_n} Results')
 
-    concat_df_filled = fill_missing_months(concat_df, top_n_array)
+    # Quarterly and rolling views are computed here, so the browser only gets the points it draws
+    concat_df_filled = aggregate_usage(fill_missing_months(concat_df, top_n_array), aggregation)
+    concat_df_filled = join_species(concat_df_filled, species, ['Sprite Links'])
+    webgl = len(top_n_array) >= WEBGL_TRACES
     fig = px.line(concat_df_filled, x='Month', y='Usage Rate', color="Name",
-                  title=None, markers=True, custom_data=['Sprite Links', 'Name'])
+                  title=None, markers=True, custom_data=['Sprite Links', 'Name'],
+                  render_mode='webgl' if webgl else 'auto')
+    if aggregation == 'envelope':
+        add_usage_envelope(fig, concat_df_filled, webgl)
 
     fig.update_layout(template='plotly_dark', font=dict(color=colors['text']),
                       legend=dict(
@@ -262,13 +444,86 @@ def update_graph(given_tier, top_n, ladder_ranking):
                       )
 
     # Set the x-axis range
-    start_date = datetime(2022, 10, 1)
-    end_date = datetime.today().replace(day=1) - relativedelta(months=1)
+    start_date = start_month or datetime(2022, 10, 1)
+    end_date = end_month or datetime.today().replace(day=1) - relativedelta(months=1)
 
     fig.update_xaxes(dtick='M3', tickformat='%b %Y', range=[start_date, end_date])
     return fig
 
 
+def add_usage_envelope(fig, df, webgl):
+    # Shades each Pokémon's lowest to highest month of every quarter behind its average line
+    scatter = go.Scattergl if webgl else go.Scatter
+    bands = []
+    for line in fig.data:
+        rows = df[df['Name'] == line.name]
+        red, green, blue = px.colors.hex_to_rgb(line.line.color)
+        common = dict(x=rows['Month'], mode='lines', line=dict(width=0), legendgroup=line.legendgroup,
+                      showlegend=False, hoverinfo='skip')
+        bands.append(scatter(y=rows['Usage Min'], **common))
+        bands.append(scatter(y=rows['Usage Max'], fill='tonexty', fillcolor=f'rgba({red}, {green}, {blue}, 0.2)',
+                             **common))
+    lines = fig.data
+    fig.add_traces(bands)
+    fig.data = fig.data[len(lines):] + fig.data[:len(lines)]
+
+
+def to_month(date):
+    # First of the month for a date picker value ('YYYY-MM-DD...'), None if the picker is cleared
+    return pd.Timestamp(date).to_period('M').to_timestamp() if date else None
+
+
+def cached_usage_graph(given_tier, top_n, ladder_ranking, start_date=None, end_date=None, aggregation='month'):
+    # The line graph only depends on the dropdowns, the date range and the data, so build each combination once.
+    # Waiting first means a figure built while the tier was still loading is keyed with the partial version.
+    wait_for_tier(given_tier)
+    start_month, end_month = to_month(start_date), to_month(end_date)
+    key = (figure_cache.version, given_tier, top_n, ladder_ranking, start_month, end_month, aggregation)
+    return figure_cache.get_or_build(
+        key, lambda: build_usage_graph(given_tier, top_n, ladder_ranking, start_month, end_month, aggregation))
+
+
+def prebuild_figures():
+    # Warm the figure cache with every tier x ranking x top N combination the dropdowns can produce
+    for tier in tier_options:
+        ranking_options, _ = update_ladder_ranking_options(tier['value'])
+        for ranking in ranking_options:
+            for top_n in top_n_options:
+                cached_usage_graph(tier['value'], top_n['value'], ranking['value'])
+    print(f"Prebuilt {len(figure_cache)} figures")
+
+
+# Callback to update the graph
+@app.callback(
+    Output('line-graph', 'figure'),
+    [Input('tier-dropdown', 'value'),
+     Input('top-n-results', 'value'),
+     Input('ladder-ranking', 'value'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date'),
+     Input('aggregation', 'value')]
+)
+def update_graph(given_tier, top_n, ladder_ranking, start_date=None, end_date=None, aggregation='month'):
+    return json.loads(cached_usage_graph(given_tier, top_n, ladder_ranking, start_date, end_date, aggregation))
+
+
+# Set PREBUILD_FIGURES=1 to build every line graph in the background at startup
+if os.environ.get('PREBUILD_FIGURES'):
+    threading.Thread(target=prebuild_figures, daemon=True).start()
+
+
+# Sprites downloaded by rotomScraper.py, served from assets/sprites/ when we have them
+sprite_cache = SpriteCache(os.path.join(app.config.assets_folder, 'sprites'))
+
+
+@server.after_request
+def cache_sprites(response):
+    # Local sprites are named after their content, so a URL never changes what it points to
+    if response.status_code == 200 and request.path.startswith(SPRITE_URL_PATH):
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
 # Callback to display the image on click
 @app.callback(
     Output('image-container', 'children'),
@@ -280,8 +535,10 @@ def display_image(clickData):
 
     # Extract the sprite link from clickData's customdata
     sprite_link = clickData['points'][0]['customdata'][0]
+    if not sprite_link:
+        return ""
 
-    return html.Img(src=sprite_link,
+    return html.Img(src=sprite_cache.local_url(sprite_link),
                     style={
                         ''"margin-top": "-75px", "left": "-20px", "top": "20px", "width": "210px", "height": "210px",
                         "max-width": "100%", "max-height": "100%"}, className='center')
@@ -332,91 +589,112 @@ def update_stats_graph(clickData):
 
         pokemon_name = customdata[1]
 
-        # Filter pokemon_stats DataFrame to get stats for the selected Pokémon
-        pokemon_stats_df = df_final[df_final['Name'] == pokemon_name]
+        # Look up the selected Pokémon's stats bar chart
+        fig = species_index.stats_figure(pokemon_name)
 
-        if pokemon_stats_df.empty:
+        if fig is None:
             return px.bar(title=f"No stats available for {pokemon_name}"), {'display': 'block'}
 
-        # Example: Assuming you have columns like 'HP', 'Attack', 'Defense'
-        stats_columns = ['HP', 'Attack', 'Defense', 'Sp.Attack', 'Sp.Defense',
-                         'Speed']  # Replace with your actual stat columns
-
-        # Select only the stats columns for the selected Pokémon
-        stats_data = pokemon_stats_df[stats_columns].iloc[0]
-
-        # Create a DataFrame suitable for plotting with Plotly Express
-        stats_df = pd.DataFrame({
-            'Stat': stats_data.index,
-            'Value': stats_data.values
-        })
-
-        fig = px.bar(stats_df, x='Stat', y='Value',
-                     title=f'Stats for {pokemon_name}')
-        fig.update_layout(template='plotly_dark', yaxis_title=None,
-                          xaxis_title=None, title="")
-
         return fig, {'display': 'block'}
     except (IndexError, KeyError) as e:
         print(f"Error accessing custom data: {e}")
         return px.bar(title="Error displaying stats"), {'display': 'block', 'width': '60%', 'height': '80%'}
 
 
-cutoff_df = df_final[(df_final['Month'] == '2024-06') &
-    (df_final['Usage Rate'] >= 3.406)]
-cutoff_df.to_excel('test_date.xlsx')
+# Moveset sections shown for the clicked Pokémon, with how many rows of each
+moveset_panels = [('abilities', 'Abilities', 3), ('items', 'Items', 5), ('moves', 'Moves', 8),
+                  ('tera_types', 'Tera Types', 3), ('spreads', 'Spreads', 3)]
+teammate_panels = [('teammates', 'Top Teammates', 10), ('checks', 'Checks and Counters', 10)]
 
-combined_cutoff_df = pd.concat([cutoff_df[['Name', 'Tier', 'Month', 'Type1']].rename(columns={'Type1': 'Type'}),
-                                cutoff_df[['Name', 'Tier', 'Month', 'Type2']].rename(columns={'Type2': 'Type'})])
-#Remove all null boxes and boxes with "---"
-combined_cutoff_df = combined_cutoff_df.loc[
-    combined_cutoff_df['Type'].notna() & (combined_cutoff_df['Type'] != '') & (combined_cutoff_df['Type'] != '---')]
-combined_cutoff_df.to_excel('test_data_two.xlsx')
 
-# Determine the most common type for each tier
-most_common_types = combined_cutoff_df.groupby('Tier')['Type'].agg(lambda x: x.value_counts().idxmax()).to_dict()
+def clicked_pokemon(clickData):
+    # (name, month) of the clicked line graph point, or None
+    if clickData is None or not clickData['points']:
+        return None
+    try:
+        point = clickData['points'][0]
+        return point['customdata'][1], point['x']
+    except (IndexError, KeyError, TypeError) as e:
+        print(f"Error accessing custom data: {e}")
+        return None
+
+
+def moveset_tables(panels, pokemon_name, given_tier, ladder_ranking, month):
+    cell_style = {'border': '1px solid white', 'padding': '4px 8px', 'background-color': 'black', 'color': 'white'}
+    tables = []
+    for section, title, n in panels:
+        rows = moveset_index.lookup(section, pokemon_name, given_tier, ladder_ranking, month, n)
+        if rows is None:
+            continue
+        # Checks list a matchup score and the KO/switch rate behind it instead of a usage %
+        if section == 'checks':
+            cells = [[value, f"{usage:.2f}", performance]
+                     for value, usage, performance in zip(rows['Check'], rows['Usage %'], rows['Performance'])]
+        else:
+            cells = [[value, f"{usage:.2f}%"] for value, usage in zip(rows[rows.columns[0]], rows['Usage %'])]
+        tables.append(html.Div([
+            html.H4(title),
+            html.Table(html.Tbody([
+                html.Tr([html.Td(cell, style=cell_style) for cell in row]) for row in cells
+            ]), style={'border-collapse': 'collapse'})
+        ]))
+    return tables
+
+
+# Callback to show the clicked Pokémon's most common sets for that month
+@app.callback(
+    Output('moveset-info', 'children'),
+    Input('line-graph', 'clickData'),
+    [State('tier-dropdown', 'value'),
+     State('ladder-ranking', 'value')]
+)
+def update_moveset_info(clickData, given_tier, ladder_ranking):
+    clicked = clicked_pokemon(clickData)
+    if clicked is None:
+        return []
+    pokemon_name, month = clicked
+
+    tables = moveset_tables(moveset_panels, pokemon_name, given_tier, ladder_ranking, month)
+    if not tables:
+        return [html.P(f"No moveset data for {pokemon_name} in {str(month)[:7]}")]
+    return tables
 
-# Determine the least common type for each tier
-least_common_types = combined_cutoff_df.groupby('Tier')['Type'].agg(lambda x: x.value_counts().idxmin()).to_dict()
 
-# Determine the highest BST Pokémon for each tier
-highest_bst_pokemon = cutoff_df.loc[cutoff_df.groupby('Tier')['BST'].idxmax()].set_index('Tier')['Name'].to_dict()
+# Callback to show who the clicked Pokémon was paired with, and what beat it, that month
+@app.callback(
+    Output('teammates-checks', 'children'),
+    Input('line-graph', 'clickData'),
+    [State('tier-dropdown', 'value'),
+     State('ladder-ranking', 'value')]
+)
+def update_teammates_checks(clickData, given_tier, ladder_ranking):
+    clicked = clicked_pokemon(clickData)
+    if clicked is None:
+        return []
+    pokemon_name, month = clicked
 
-# Determine the lowest BST Pokémon for each tier
-lowest_bst_pokemon = cutoff_df.loc[cutoff_df.groupby('Tier')['BST'].idxmin()].set_index('Tier')['Name'].to_dict()
+    tables = moveset_tables(teammate_panels, pokemon_name, given_tier, ladder_ranking, month)
+    if not tables:
+        return [html.P(f"No teammates or checks data for {pokemon_name} in {str(month)[:7]}")]
+    return tables
 
-# Determine the average BST of the Pokemon in each tier
-average_bst_tier = cutoff_df.groupby('Tier')['BST'].mean().round().to_dict()
 
 # Callback to update conditional text based on dropdown selection
 @app.callback(
     Output('conditional-text', 'children'),
-    [Input('tier-dropdown', 'value')]
+    [Input('tier-dropdown', 'value'),
+     Input('ladder-ranking', 'value')]
 )
-def update_conditional_text(given_tier):
-    common_type = most_common_types.get(given_tier, "Unknown")
-    highest_bst = highest_bst_pokemon.get(given_tier, "Unknown")
-    lowest_bst = lowest_bst_pokemon.get(given_tier, "Unknown")
-    average_bst = average_bst_tier.get(given_tier, "Unknown")
-
-    # Define types to exclude based on generation (given_tier)
-    excluded_types = []
-    if given_tier in ["gen1ou"]:
-        excluded_types.extend(['dark', 'steel', 'fairy'])
-    elif given_tier in ["gen2ou", "gen3ou", "gen4ou", "gen5ou"]:
-        excluded_types.append('fairy')
-
-    # Function to get least common type, excluding specified types
-    def least_common_excluding(types):
-        type_counts = Counter(types)
-        for type_, count in type_counts.most_common()[::-1]:
-            if type_ not in excluded_types:
-                return type_
-        return "Unknown"
-
-    # Get the types for the given tier
-    tier_types = combined_cutoff_df[combined_cutoff_df['Tier'] == given_tier]['Type'].tolist()
-    uncommon_type = least_common_excluding(tier_types)
+def update_conditional_text(given_tier, ladder_ranking):
+    # Insights for the latest month of the selected tier and ladder ranking
+    wait_for_tier(given_tier)
+    latest_month = usage_index.latest_month(given_tier, ladder_ranking)
+    entry = insights.get((given_tier, ladder_ranking, latest_month), {})
+    common_type = entry.get('Most Common Type', "Unknown")
+    uncommon_type = entry.get('Least Common Type', "Unknown")
+    highest_bst = entry.get('Highest BST', "Unknown")
+    lowest_bst = entry.get('Lowest BST', "Unknown")
+    average_bst = entry.get('Average BST', "Unknown")
 
     table_style = {
         'border-collapse': 'collapse',
@@ -451,48 +729,60 @@ def update_conditional_text(given_tier):
         'width': '100%'
     })
 
-# Initialize client once (outside callbacks)
-
-import google.generativeai as genai
+# Any object with generate_content(prompt, request_options=...).text works here, e.g. a stub for running offline. The Gemini client is
+# created on the first summary that isn't cached, importing the SDK takes seconds and most workers never need it.
+summary_model = None
+summary_model_lock = threading.Lock()
+# Identical prompts for the same data month are answered from disk instead of spending API quota
+summary_cache = SummaryCache('summary_cache.json')
+# At most one Gemini call every two seconds per worker
+summary_limiter = RateLimiter(0.5)
+# Seconds before a model call is given up on, both by the poll and by the request itself so it frees its thread
+SUMMARY_TIMEOUT = 60
+# Model calls run here instead of on the request thread, two at a time
+summary_jobs = BackgroundJobs(max_workers=2, max_pending=20, timeout=SUMMARY_TIMEOUT)
 
-genai.configure(api_key="######") #Use your own API key
 
-@app.callback(
-    Output('ai-meta-summary', 'children'),
-    [Input('tier-dropdown', 'value'),
-     Input('top-n-results', 'value'),
-     Input('ladder-ranking', 'value')]
-)
+def get_summary_model():
+    global summary_model
+    with summary_model_lock:
+        if summary_model is None:
+            # Initialize client once (outside callbacks)
+            import google.generativeai as genai
 
-def generate_meta_summary(given_tier, top_n, ladder_ranking):
+            genai.configure(api_key="######") #Use your own API key
+            summary_model = genai.GenerativeModel('gemini-1.5-pro')
+    return summary_model
 
-    filtered_df = df_final[
-        (df_final['Tier'] == given_tier) &
-        (df_final['Ranking'] == ladder_ranking)
-    ]
 
-    if filtered_df.empty:
-        return "No data available for analysis"
+def call_summary_model(prompt):
+    summary_limiter.wait('gemini')
+    return get_summary_model().generate_content(prompt, request_options={'timeout': SUMMARY_TIMEOUT}).text
 
-    filtered_df['Month'] = pd.to_datetime(filtered_df['Month'])
-    latest_month = filtered_df['Month'].max()
-    # Ensure only Pokémon that are legal in this tier *this month* are considered
-    latest_data = filtered_df[
-        (filtered_df['Month'] == latest_month) &
-        (filtered_df['Tier'] == given_tier)
-        ].nlargest(top_n, 'Usage Rate')
 
+def build_summary_prompt(given_tier, top_n, ladder_ranking):
+    # Returns (prompt, data month), or (None, None) if there's no data for the selection
+    wait_for_tier(given_tier)
+    latest_month = usage_index.latest_month(given_tier, ladder_ranking)
+    if latest_month is None:
+        return None, None
 
-    #Get prev month data
     prev_month = (pd.to_datetime(latest_month) - pd.DateOffset(months=1))
-    prev_data = filtered_df[
-        (filtered_df['Month'] == prev_month) &
-        (filtered_df['Tier'] == given_tier)
-        ].nlargest(top_n, 'Usage Rate')
+    # This month's rows compared with last month, most used first, precomputed by the scraper (see movers.py)
+    month_movers = movers.get((given_tier, ladder_ranking, latest_month))
+    if month_movers is None:
+        return None, None
+
+    # Ensure only Pokémon that are legal in this tier *this month* are considered
+    in_tier = month_movers[month_movers['Status'] != 'exited']
+    latest_data = join_species(in_tier.head(top_n), species, ['Type1', 'Type2', 'BST'])
+    # Last month's top N that dropped out of the tier this month (banned or no longer used)
+    exited = month_movers[(month_movers['Status'] == 'exited') & (month_movers['Previous Rank'] <= top_n)]
+    exited = exited.sort_values('Previous Rank')
     # (Optional) Markdown tables
-    current_md_table = latest_data[['Name', 'Usage Rate', 'Tier', 'Type1', 'Type2', 'BST', 'Month']].to_markdown(
-        index=False)
-    prev_md_table = prev_data[['Name', 'Usage Rate', 'Tier', 'Type1', 'Type2', 'BST', 'Month']].to_markdown(index=False)
+    current_md_table = latest_data[['Name', 'Usage Rate', 'Previous Usage', 'Usage Change', 'Rank Change', 'Trend',
+                                    'Type1', 'Type2', 'BST']].to_markdown(index=False)
+    exited_md_table = exited[['Name', 'Previous Usage', 'Previous Rank']].to_markdown(index=False)
 
     prompt = f"""You are a competitive Pokémon analyst for {given_tier.upper()} format in.
 
@@ -504,19 +794,95 @@ def generate_meta_summary(given_tier, top_n, ladder_ranking):
     - Do not invent roles or abilities not in the dataset
     - Only base analysis on Usage Rate for a pokemon throughout {prev_month} to {latest_month}
     - If a mon's usage is 0% for a month, assume it is not in the tier/banned
-    - current_md_table has the data for the current month. prev_md_table has the data for the previous month
+    - current_md_table has the top {top_n} for {latest_month} with their usage in {prev_month}, the change, how many places they moved up (negative is down) and their average monthly change over the last three months (Trend)
+    - exited_md_table has the Pokémon from the previous top {top_n} that dropped out of the tier in {latest_month}
 
-    DATA: {current_md_table}, {prev_md_table}
+    DATA: {current_md_table}, {exited_md_table}
 
 """
+    return prompt, latest_month.strftime('%Y-%m')
 
-    try:
-        model = genai.GenerativeModel('gemini-1.5-pro')
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"AI Analysis Error: {str(e)}"
 
+@app.callback(
+    [Output('ai-meta-summary', 'children'),
+     Output('ai-summary-job', 'data'),
+     Output('ai-summary-poll', 'disabled')],
+    [Input('tier-dropdown', 'value'),
+     Input('top-n-results', 'value'),
+     Input('ladder-ranking', 'value'),
+     Input('ai-summary-poll', 'n_intervals')],
+    [State('ai-summary-job', 'data')]
+)
+
+def generate_meta_summary(given_tier, top_n, ladder_ranking, n_intervals, job):
+    # job is {'key': summary cache key, 'submitted': wall clock time} while a summary is being generated
+    if dash.ctx.triggered_id == 'ai-summary-poll':
+        return poll_meta_summary(job, given_tier, top_n, ladder_ranking)
+
+    # The selection changed, so this client no longer waits on whatever it was generating for the old one
+    if job:
+        summary_jobs.release(job['key'])
+
+    prompt, month = build_summary_prompt(given_tier, top_n, ladder_ranking)
+    if prompt is None:
+        return "No data available for analysis", None, True
+
+    key = summary_cache.make_key(prompt, month)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        return cached, None, True
+    return submit_meta_summary(key, prompt, month)
+
+
+def submit_meta_summary(key, prompt, month):
+    try:
+        summary_jobs.submit(key, lambda: summary_cache.get_or_generate(prompt, month, call_summary_model))
+    except QueueFull:
+        return "AI Analysis is busy right now, try again in a minute", None, True
+    return "Generating meta analysis...", {'key': key, 'submitted': time.time()}, False
+
+
+def poll_meta_summary(job, given_tier, top_n, ladder_ranking):
+    job_id = job['key']
+    status, value = summary_jobs.poll(job_id)
+    if status == 'pending':
+        return dash.no_update, job, False
+    if status != 'missing':
+        summary_jobs.release(job_id)
+    if status == 'done':
+        return value, None, True
+    if status == 'error':
+        return f"AI Analysis Error: {str(value)}", None, True
+    if status == 'timeout':
+        return "AI Analysis Error: the model took too long to respond", None, True
+
+    # This worker doesn't know the job: with several workers the poll may land on one that didn't submit it, or
+    # it was dropped after finishing. The result is in the shared cache once it finished anywhere. Until the
+    # submitting worker would have given up on it, keep waiting rather than calling the model a second time.
+    cached = summary_cache.get(job_id)
+    if cached is not None:
+        return cached, None, True
+    if time.time() - job['submitted'] <= SUMMARY_TIMEOUT:
+        return dash.no_update, job, False
+    # Lost: the worker that ran it went away or its result never reached the cache, start it again here
+    prompt, month = build_summary_prompt(given_tier, top_n, ladder_ranking)
+    if prompt is None or summary_cache.make_key(prompt, month) != job_id:
+        return "AI Analysis Error: the analysis was lost, change the selection to try again", None, True
+    return submit_meta_summary(job_id, prompt, month)
+
+
+first_request_logged = False
+
+
+@server.before_request
+def log_first_request():
+    global first_request_logged
+    if not first_request_logged:
+        first_request_logged = True
+        print(f"First request {time.perf_counter() - import_started:.2f}s after startup")
+
+
+print(f"App loaded in {time.perf_counter() - import_started:.2f}s")
 
 if __name__ == "__main__":
     # Get the port from the environment variable or use 8050 as default
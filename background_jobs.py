@@ -0,0 +1,75 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(Exception):
+    pass
+
+
+class BackgroundJobs:
+    # Runs slow work (like a Gemini call) on a small thread pool so callbacks can return straight away and poll
+    # for the result. max_workers caps how many jobs run at once and max_pending how many can be waiting, so
+    # one slow model can't tie up every request thread. Jobs are identified by the caller's own key, and
+    # submitting a key that is already queued or running joins that job instead of starting another.
+    # Every submit takes a reference to the job that the caller gives back with release() once it has the result
+    # or stops waiting, so one client moving on doesn't take the job away from others waiting on the same key.
+    # The work itself should give up on its own after timeout (e.g. a request timeout), a running thread can't
+    # be stopped from here.
+    def __init__(self, max_workers=2, max_pending=20, timeout=60):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='background-job')
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        # job_id: [future, start time, references]
+        self.jobs = {}
+
+    def submit(self, job_id, fn):
+        with self.lock:
+            self.prune()
+            if job_id in self.jobs:
+                self.jobs[job_id][2] += 1
+                return job_id
+            if sum(not job[0].done() for job in self.jobs.values()) >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} jobs already waiting")
+            self.jobs[job_id] = [self.executor.submit(fn), time.monotonic(), 1]
+        return job_id
+
+    def release(self, job_id):
+        # Gives back one submit's reference. The last one drops the job: a job that hasn't started yet never
+        # runs, one that already started keeps running in its thread but nobody waits on it anymore.
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job[2] -= 1
+            if job[2] > 0:
+                return
+            del self.jobs[job_id]
+        job[0].cancel()
+
+    def poll(self, job_id):
+        # Returns (status, value): ('pending', None), ('done', result), ('error', exception),
+        # ('timeout', None), or ('missing', None) for a job this process doesn't know about.
+        # Polling doesn't release the caller's reference, so every client waiting on a job sees its result.
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return 'missing', None
+        future, started, _ = job
+        if not future.done():
+            if time.monotonic() - started > self.timeout:
+                return 'timeout', None
+            return 'pending', None
+
+        error = future.exception()
+        if error is not None:
+            return 'error', error
+        return 'done', future.result()
+
+    def prune(self):
+        # Forget finished jobs nobody came back for
+        now = time.monotonic()
+        for job_id, (future, started, _) in list(self.jobs.items()):
+            if future.done() and now - started > self.timeout:
+                del self.jobs[job_id]
@@ -0,0 +1,956 @@
+import io
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from data_store import (STAT_COLUMNS, NameDictionary, attach_shared_dataset, encode_moveset_table, join_species,
+                        load_usage_data, load_usage_tables, prepare_usage_dtypes, split_species, write_moveset_store,
+                        write_shared_dataset, write_usage_store)
+from extract_teammates_and_checks import extract_teammates_and_checks, iter_parsed_files, parse_moveset_file
+from fetcher import Fetcher
+from moveset_index import MovesetIndex
+from moveset_parser import parse_moveset_sections
+from movers import compute_movers, index_movers
+from summary_cache import SummaryCache
+from usage_index import UsageIndex, fill_missing_months
+from response_cache import ResponseCache
+from rotomScraper import build_species, clean_usage_rows
+from species_index import SpeciesIndex
+from sprite_cache import SpriteCache
+from usage_parser import UsageFormatError, parse_usage_text
+
+# Local stand-ins for the scrapers' hot paths. Run with: python benchmarks.py [name ...]
+
+LATENCY = 0.05  # Simulated round trip to smogon.com, in seconds
+
+
+def make_usage_text(tier, rows=400):
+    # Same layout as https://www.smogon.com/stats/<month>/<tier>-<rating>.txt
+    lines = [
+        " Total battles: 123456",
+        " Avg. weight/team: 0.123",
+        " + ---- + ------------------ + --------- + ------ + ------- + ------ + ------- + ",
+        " | Rank | Pokemon            | Usage %   | Raw    | %       | Real   | %       | ",
+        " + ---- + ------------------ + --------- + ------ + ------- + ------ + ------- + ",
+    ]
+    for rank in range(1, rows + 1):
+        usage = 50.0 / rank
+        lines.append(f" | {rank:<4} | {tier + '-' + str(rank):<18} | {usage:8.5f}% | {1000 * rows // rank:<6} "
+                     f"| {usage:6.3f}% | {900 * rows // rank:<6} | {usage:6.3f}% | ")
+    lines.append(" + ---- + ------------------ + --------- + ------ + ------- + ------ + ------- + ")
+    return "\n".join(lines) + "\n"
+
+
+def make_usage_frame(n_months=24, tiers=None, rankings=(0, 1500, 1760, 1825), rows=300, seed=0):
+    # Synthetic df_final with the same columns rotomScraper.py produces, some Pokemon drop out for a few months
+    rng = np.random.default_rng(seed)
+    tiers = tiers or ['gen9ou', 'gen9ubers', 'gen9uu', 'gen8ou']
+    months = pd.date_range('2022-10-01', periods=n_months, freq='MS').strftime('%Y-%m')
+    species = [f"Mon{i}" for i in range(rows * 2)]
+    frames = []
+    for tier in tiers:
+        for ranking in rankings:
+            for month in months:
+                names = rng.choice(species, size=rows, replace=False)
+                usage = np.sort(rng.uniform(0.001, 60, size=rows))[::-1]
+                frames.append(pd.DataFrame({
+                    'Rank': np.arange(1, rows + 1), 'Name': names, 'Usage Rate': usage.round(5),
+                    'Raw Usage': (usage * 1000).astype(int), 'Raw %': [f"{u:.3f}%" for u in usage],
+                    'Tier': tier, 'Month': month, 'Ranking': ranking,
+                }))
+    df = pd.concat(frames, ignore_index=True)
+    stats = pd.DataFrame(rng.integers(20, 160, size=(len(species), 6)), index=species,
+                         columns=['HP', 'Attack', 'Defense', 'Sp.Attack', 'Sp.Defense', 'Speed'])
+    df = df.join(stats, on='Name')
+    df['Sprite Links'] = 'https://img.pokemondb.net/sprites/scarlet-violet/icon/' + df['Name'].str.lower() + '.png'
+    df['Type1'] = rng.choice(['fire', 'water', 'grass', 'steel', 'fairy'], size=len(df))
+    df['Type2'] = rng.choice(['---', 'flying', 'dragon', 'ghost'], size=len(df))
+    df['BST'] = df[stats.columns].sum(axis=1)
+    return df
+
+
+class StatsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(LATENCY)
+        name = self.path.rsplit('/', 1)[-1]
+        if not name.endswith('.txt') or name.endswith('-404.txt'):
+            self.send_response(404)
+            self.end_headers()
+            return
+        # Past months never change, so the path works as an ETag
+        etag = f'"{abs(hash(self.path))}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = make_usage_text(name.split('-')[0]).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SavedFileHandler(BaseHTTPRequestHandler):
+    # Serves the files in `directory` by name, whatever the rest of the path is
+    directory = None
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        path = os.path.join(self.directory, self.path.rsplit('/', 1)[-1])
+        if not os.path.isfile(path):
+            self.send_response(404)
+            self.end_headers()
+            return
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(handler=StatsHandler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def bench_fetch(n_files=60):
+    # Serial pd.read_csv(url) loop (the old rotomScraper) vs the pooled, rate-limited Fetcher
+    server, base = start_server()
+    urls = [f"{base}/stats/2024-{i % 12 + 1:02d}/gen9tier{i}-0.txt" for i in range(n_files)]
+
+    begin = time.perf_counter()
+    serial = [pd.read_csv(u) for u in urls]
+    serial_time = time.perf_counter() - begin
+
+    fetcher = Fetcher(max_workers=8, rate=0)
+    begin = time.perf_counter()
+    pooled = [pd.read_csv(io.StringIO(text)) for _, text in fetcher.fetch_all(urls)]
+    pooled_time = time.perf_counter() - begin
+
+    # Missing files come back as None without retrying
+    assert fetcher.fetch(f"{base}/stats/2024-01/gen9ou-404.txt") is None
+    fetcher.close()
+    server.shutdown()
+
+    assert all(a.equals(b) for a, b in zip(serial, pooled))
+    print(f"fetch: {n_files} files, serial {serial_time:.2f}s ({n_files / serial_time:.1f} files/s), "
+          f"pooled {pooled_time:.2f}s ({n_files / pooled_time:.1f} files/s), "
+          f"speedup x{serial_time / pooled_time:.1f}")
+
+
+def bench_cache(n_files=60):
+    # Cold download vs ETag revalidation vs offline replay from the raw response cache
+    server, base = start_server()
+    urls = [f"{base}/stats/2024-{i % 12 + 1:02d}/gen9tier{i}-0.txt" for i in range(n_files)]
+    cache_dir = tempfile.mkdtemp()
+    timings = {}
+    bodies = {}
+    for mode in ['cold', 'revalidate', 'offline']:
+        fetcher = Fetcher(max_workers=8, rate=0, cache=ResponseCache(cache_dir), offline=mode == 'offline')
+        begin = time.perf_counter()
+        bodies[mode] = [text for _, text in fetcher.fetch_all(urls)]
+        timings[mode] = time.perf_counter() - begin
+        fetcher.close()
+    server.shutdown()
+
+    # Eviction keeps the blobs under the size cap, dropping least recently used URLs first
+    cache = ResponseCache(cache_dir, max_bytes=len(bodies['cold'][0].encode('utf-8')) * 10)
+    cache.evict()
+    assert len(cache) <= 10 and cache.total_bytes <= cache.max_bytes
+    shutil.rmtree(cache_dir)
+
+    assert bodies['cold'] == bodies['revalidate'] == bodies['offline']
+    print(f"cache: {n_files} files, cold {timings['cold']:.2f}s, revalidate {timings['revalidate']:.2f}s, "
+          f"offline replay {timings['offline']:.3f}s")
+
+
+def bench_load(n_months=36):
+    # App startup: read_excel of the old workbook vs read_parquet of the partitioned store
+    df = make_usage_frame(n_months=n_months)
+    work_dir = tempfile.mkdtemp()
+    excel_path = f"{work_dir}/sample_data.xlsx"
+    store_path = f"{work_dir}/usage_data"
+    df.to_excel(excel_path)
+    write_usage_store(prepare_usage_dtypes(df), store_path)
+
+    begin = time.perf_counter()
+    from_excel = pd.read_excel(excel_path)
+    excel_time = time.perf_counter() - begin
+    begin = time.perf_counter()
+    from_store = load_usage_data(store_path)
+    store_time = time.perf_counter() - begin
+    shutil.rmtree(work_dir)
+
+    assert len(from_excel) == len(from_store)
+    print(f"load: {len(df)} rows, read_excel {excel_time:.2f}s ({from_excel.memory_usage(deep=True).sum() / 2**20:.0f} MiB), "
+          f"parquet {store_time:.3f}s ({from_store.memory_usage(deep=True).sum() / 2**20:.0f} MiB)")
+
+
+def rss_mib():
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmRSS')) / 1024
+
+
+def report_rss(layout, path):
+    # Runs in a fresh interpreter: RSS after loading df_final in the given layout, and how much of it is the data
+    baseline = rss_mib()
+    if layout == 'wide':
+        data = [pd.read_pickle(path)]
+    else:
+        data = list(load_usage_tables(path))
+    data_bytes = sum(df.memory_usage(deep=True).sum() for df in data)
+    print(f"{rss_mib():.0f} {rss_mib() - baseline:.0f} {data_bytes / 2**20:.0f}")
+
+
+def bench_memory(n_months=26):
+    # RSS of one app worker holding df_final: the old object/float64 frame read from Excel vs the compact
+    # usage + species tables. Every gunicorn worker holds its own copy.
+    tiers = ['gen9ubers', 'gen9ou', 'gen9uu', 'gen9ru', 'gen9nu', 'gen9pu', 'gen9zu',
+             'gen8ou', 'gen7ou', 'gen6ou', 'gen5ou', 'gen4ou', 'gen3ou', 'gen2ou', 'gen1ou']
+    df = make_usage_frame(n_months=n_months, tiers=tiers, rankings=(0, 1500, 1760))
+    work_dir = tempfile.mkdtemp()
+    # What read_excel used to hand the app: strings as objects, numbers as int64/float64
+    df.astype({'Ranking': object}).to_pickle(f"{work_dir}/wide.pkl")
+    write_usage_store(prepare_usage_dtypes(df), f"{work_dir}/usage_data")
+
+    results = {}
+    for layout, path in [('wide', f"{work_dir}/wide.pkl"), ('compact', f"{work_dir}/usage_data")]:
+        output = subprocess.run([sys.executable, '-c', f"import benchmarks; benchmarks.report_rss({layout!r}, {path!r})"],
+                                capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        results[layout] = output.stdout.split()[-3:]
+    shutil.rmtree(work_dir)
+    print(f"memory: {len(df)} rows, " + ", ".join(
+        f"{layout} RSS {rss} MiB (+{delta} MiB loading, {size} MiB of frames)" for layout, (rss, delta, size) in results.items()))
+
+
+def hold_dataset(layout, path):
+    # Runs in a fresh interpreter standing in for one app worker, until the parent closes stdin
+    usage, species = load_usage_tables(path) if layout == 'private' else attach_shared_dataset(path)[:2]
+    UsageIndex(usage)
+    print('ready', flush=True)
+    sys.stdin.read()
+
+
+def memory_kib(pid, field):
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field + ':'))
+
+
+def bench_shared(n_workers=4, n_months=26):
+    # Total memory of n_workers app workers each loading their own copy of the usage store vs all of them
+    # mapping the shared Arrow dataset. PSS splits shared pages between the processes mapping them.
+    tiers = ['gen9ubers', 'gen9ou', 'gen9uu', 'gen9ru', 'gen9nu', 'gen9pu', 'gen9zu',
+             'gen8ou', 'gen7ou', 'gen6ou', 'gen5ou', 'gen4ou', 'gen3ou', 'gen2ou', 'gen1ou']
+    df = prepare_usage_dtypes(make_usage_frame(n_months=n_months, tiers=tiers, rankings=(0, 1500, 1760)))
+    work_dir = tempfile.mkdtemp()
+    write_usage_store(df, f"{work_dir}/usage_data")
+    write_shared_dataset(*split_species(df), f"{work_dir}/usage_shared")
+
+    results = {}
+    for layout, path in [('private', f"{work_dir}/usage_data"), ('shared', f"{work_dir}/usage_shared")]:
+        workers = [subprocess.Popen([sys.executable, '-c', f"import benchmarks; benchmarks.hold_dataset({layout!r}, {path!r})"],
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))) for _ in range(n_workers)]
+        for worker in workers:
+            assert worker.stdout.readline().strip() == 'ready'
+        results[layout] = [sum(memory_kib(worker.pid, field) for worker in workers) / 1024 for field in ['Rss', 'Pss']]
+        for worker in workers:
+            worker.communicate('')
+    shutil.rmtree(work_dir)
+    print(f"shared: {len(df)} rows, {n_workers} workers, " + ", ".join(
+        f"{layout} total RSS {rss:.0f} MiB / PSS {pss:.0f} MiB" for layout, (rss, pss) in results.items()))
+
+
+def bench_index(n_months=36, repeats=20):
+    # Per-callback data selection: boolean scan of df_final (the old update_graph) vs UsageIndex lookups
+    df = prepare_usage_dtypes(make_usage_frame(n_months=n_months))
+    selections = [(tier, ranking, top_n) for tier in ['gen9ou', 'gen8ou'] for ranking in [1000, 1825] for top_n in [5, 25]]
+
+    def old_select(tier, ranking, top_n):
+        filtered_df = df[(df['Tier'] == tier) & (df['Ranking'] == ranking)].copy()
+        filtered_df['Month'] = pd.to_datetime(filtered_df['Month'])
+        sorted_df = filtered_df.sort_values(by=['Month', 'Usage Rate'], ascending=[True, False])
+        latest_top_n = sorted_df[sorted_df['Month'] == sorted_df['Month'].max()].nlargest(top_n, 'Usage Rate')
+        return sorted_df[sorted_df['Name'].isin(latest_top_n['Name'].unique())]
+
+    begin = time.perf_counter()
+    usage_index = UsageIndex(df)
+    build_time = time.perf_counter() - begin
+
+    def new_select(tier, ranking, top_n):
+        sorted_df = usage_index.get(tier, ranking)
+        return sorted_df[sorted_df['Name'].isin(usage_index.top_n(tier, ranking, top_n)['Name'].unique())]
+
+    timings = {}
+    for label, select in [('scan', old_select), ('index', new_select)]:
+        begin = time.perf_counter()
+        for _ in range(repeats):
+            results = [select(*selection) for selection in selections]
+        timings[label] = (time.perf_counter() - begin) / (repeats * len(selections))
+        timings[label + '_results'] = results
+
+    for old, new in zip(timings['scan_results'], timings['index_results']):
+        assert old.reset_index(drop=True).equals(new.reset_index(drop=True))
+    print(f"index: {len(df)} rows, scan {timings['scan'] * 1000:.2f} ms/callback, "
+          f"index {timings['index'] * 1000:.2f} ms/callback (built once in {build_time * 1000:.0f} ms)")
+
+
+def fill_missing_months_loop(df, top_n_array):
+    # The per-Pokemon loop app.py used before fill_missing_months was vectorized, kept unchanged as the reference.
+    # It needs plain object columns (what the Excel export loaded as), a categorical column can't take the 0 fill.
+    df['Month'] = pd.to_datetime(df['Month'])
+    all_months = pd.date_range(df['Month'].min(), df['Month'].max(), freq='MS')
+    result = []
+    for name in top_n_array:
+        group = df[df['Name'] == name].set_index('Month').reindex(all_months, fill_value=0).reset_index()
+        group['Name'] = name
+        for col in ['Sprite Links', 'Ranking', 'Tier']:
+            if col in df.columns:
+                group[col] = df[df['Name'] == name][col].iloc[0] if not df[df['Name'] == name][col].empty else None
+        result.append(group)
+    df_filled = pd.concat(result)
+    df_filled.rename(columns={'index': 'Month'}, inplace=True)
+    return df_filled
+
+
+def bench_fill(repeats=10):
+    # fill_missing_months: per-Pokemon loop vs one Name x Month reindex, across top N and history length
+    for n_months in [12, 36, 72]:
+        usage_index = UsageIndex(prepare_usage_dtypes(make_usage_frame(n_months=n_months, tiers=['gen9ou'], rankings=(0,))))
+        sorted_df = usage_index.get('gen9ou', 1000)
+        for top_n in [5, 10, 25]:
+            top_n_array = usage_index.top_n('gen9ou', 1000, top_n)['Name'].unique()
+            concat_df = sorted_df[sorted_df['Name'].isin(top_n_array)]
+            object_df = concat_df.astype({col: object for col in concat_df.select_dtypes('category').columns})
+            timings = {}
+            for label, fill, df in [('loop', fill_missing_months_loop, object_df),
+                                    ('vectorized', fill_missing_months, concat_df)]:
+                begin = time.perf_counter()
+                for _ in range(repeats):
+                    filled = fill(df.copy(), top_n_array)
+                timings[label] = (time.perf_counter() - begin) / repeats * 1000
+                timings[label + '_result'] = filled.reset_index(drop=True)
+            pd.testing.assert_frame_equal(timings['loop_result'], timings['vectorized_result'])
+            print(f"fill: {n_months} months, top {top_n}: loop {timings['loop']:.1f} ms, "
+                  f"vectorized {timings['vectorized']:.1f} ms")
+
+
+class StubModel:
+    # Stands in for the Gemini client so the summary path runs offline
+    def __init__(self, latency=0.5):
+        self.latency = latency
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency)
+        return type('Response', (), {'text': f"Summary of {len(prompt)} characters"})()
+
+
+def bench_summary(n_users=20):
+    # Many users asking for the same summary at once share one model call, and repeats come from disk
+    from concurrent.futures import ThreadPoolExecutor
+    model = StubModel()
+    work_dir = tempfile.mkdtemp()
+    cache = SummaryCache(f"{work_dir}/summary_cache.json")
+    generate = lambda prompt: model.generate_content(prompt).text
+
+    begin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_users) as pool:
+        texts = list(pool.map(lambda _: cache.get_or_generate('prompt', '2024-06', generate), range(n_users)))
+    concurrent_time = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    reloaded = SummaryCache(f"{work_dir}/summary_cache.json")
+    cached_text = reloaded.get_or_generate('prompt', '2024-06', generate)
+    cached_time = time.perf_counter() - begin
+    shutil.rmtree(work_dir)
+
+    assert len(set(texts)) == 1 and cached_text == texts[0] and model.calls == 1
+    print(f"summary: {n_users} concurrent users, {model.calls} model call, {concurrent_time:.2f}s; "
+          f"cache hit after reload {cached_time * 1000:.2f} ms")
+
+
+def extract_teammates_and_checks_split(text):
+    # The re.split parser extract_teammates_and_checks.py used before streaming, kept as the reference
+    teammates_data = []
+    checks_data = []
+
+    sections = re.split(r'\+\-+\+\s*\n\s*\|\s*(.*?)\s*\|\s*\n\s*\+\-+\+', text)
+
+    for name, block in zip(sections[1::2], sections[2::2]):
+        current_pokemon = name.strip()
+        lines = block.splitlines()
+        section = None
+
+        for line in lines:
+            line = line.strip()
+
+            if line.startswith('| Teammates'):
+                section = 'teammates'
+                continue
+            elif line.startswith('| Checks and Counters'):
+                section = 'checks'
+                continue
+            elif line.startswith('+') or not line.startswith('|'):
+                section = None
+                continue
+
+            if section == 'teammates' and '%' in line:
+                match = re.match(r'\|\s*(.*?)\s+([\d.]+)%\s*\|', line)
+                if match:
+                    teammate, usage = match.groups()
+                    teammates_data.append({
+                        "Pokemon": current_pokemon,
+                        "Teammate": teammate.strip(),
+                        "Usage %": float(usage)
+                    })
+
+            elif section == 'checks':
+                match = re.match(r'\|\s*(.*?)\s+([\d.]+)\s+\((.*?)\)\s*\|', line)
+                if match:
+                    check, usage, performance = match.groups()
+                    checks_data.append({
+                        "Pokemon": current_pokemon,
+                        "Check": check.strip(),
+                        "Usage %": float(usage),
+                        "Performance": performance.strip()
+                    })
+
+    return pd.DataFrame(teammates_data), pd.DataFrame(checks_data)
+
+
+def make_moveset_text(n_pokemon=400, seed=0):
+    # Same layout as https://www.smogon.com/stats/<month>/moveset/<tier>-<rating>.txt
+    rng = np.random.default_rng(seed)
+    border = " +----------------------------------------+ "
+    box = lambda text: f" | {text:<38} | "
+    lines = []
+    for i in range(n_pokemon):
+        lines += [border, box(f"Mon{i}"), border,
+                  box(f"Raw count: {rng.integers(1000, 900000)}"), box("Avg. weight: 0.0123456"),
+                  box("Viability Ceiling: 80"), border]
+        for section, entries in [('Abilities', 3), ('Items', 8), ('Spreads', 10), ('Moves', 15), ('Tera Types', 6)]:
+            lines.append(box(section))
+            lines += [box(f"{section[:4]}{j} {rng.uniform(0, 100):.3f}%") for j in range(entries)]
+            lines.append(border)
+        lines.append(box("Teammates"))
+        lines += [box(f"Mon{j} {rng.uniform(0, 60):.3f}%") for j in rng.choice(n_pokemon, 40, replace=False)]
+        lines.append(border)
+        lines.append(box("Checks and Counters"))
+        for j in rng.choice(n_pokemon, 0 if i % 50 == 0 else 12, replace=False):
+            lines.append(box(f"Mon{j} {rng.uniform(40, 80):.3f} ({rng.uniform(40, 90):.2f}\u00b1{rng.uniform(1, 9):.2f})"))
+            lines.append(" |\t (30.5% KOed / 40.0% switched out)    | ")
+        lines.append(border)
+        lines.append(border)
+    return "\n".join(lines) + "\n"
+
+
+def bench_moveset():
+    # Line parser vs the old re.split parser, both given the whole body as a string the way the scraper gets it
+    # from Fetcher.fetch. Peak memory is what parsing adds on top of the body, measured in a separate run since
+    # tracemalloc slows down allocating code several times over. Set MOVESET_FILE to a saved Smogon moveset .txt
+    # to run it on real data instead of a synthetic file.
+    path = os.environ.get('MOVESET_FILE')
+    if path is None:
+        text = make_moveset_text()
+    else:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+    size = len(text.encode('utf-8')) / 2**20
+
+    results = {}
+    for label, parse in [('split', extract_teammates_and_checks_split), ('line', extract_teammates_and_checks)]:
+        elapsed = []
+        for _ in range(3):
+            begin = time.perf_counter()
+            results[label] = parse(text)
+            elapsed.append(time.perf_counter() - begin)
+        tracemalloc.start()
+        parse(text)
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        results[label + '_stats'] = f"{min(elapsed) * 1000:.0f} ms, peak {peak:.1f} MiB"
+
+    for old, new in zip(results['split'], results['line']):
+        pd.testing.assert_frame_equal(old, new)
+    print(f"moveset: {size:.1f} MiB body, {len(results['line'][0])} teammates / {len(results['line'][1])} checks, "
+          f"re.split {results['split_stats']}, line parser {results['line_stats']}")
+
+
+def bench_moveset_store(n_months=6):
+    # Size of every moveset section as CSV vs the dictionary-encoded store, and a moves lookup through
+    # MovesetIndex vs a boolean scan of the decoded table
+    text = make_moveset_text()
+    tables = {}
+    for month in pd.date_range('2024-01', periods=n_months, freq='MS').strftime('%Y-%m'):
+        for section, df in parse_moveset_sections(io.StringIO(text)).items():
+            df['Month'], df['Tier'], df['Rating'] = month, 'gen9ou', '1000'
+            tables.setdefault(section, []).append(df)
+    tables = {section: pd.concat(frames, ignore_index=True) for section, frames in tables.items()}
+
+    root = tempfile.mkdtemp()
+    csv_bytes = 0
+    for section, df in tables.items():
+        df.to_csv(f"{root}/{section}.csv", index=False)
+        csv_bytes += os.path.getsize(f"{root}/{section}.csv")
+    names = NameDictionary()
+    write_moveset_store({section: encode_moveset_table(df, section, names) for section, df in tables.items()},
+                        names, f"{root}/moveset_data")
+    store_bytes = sum(os.path.getsize(os.path.join(folder, file))
+                      for folder, _, files in os.walk(f"{root}/moveset_data") for file in files)
+
+    moves = tables['moves']
+    index = MovesetIndex(f"{root}/moveset_data")
+    index.load_tier('gen9ou')
+    queries = [(f"Mon{i}", month) for i in range(0, 400, 7) for month in moves['Month'].unique()]
+    begin = time.perf_counter()
+    for pokemon, month in queries:
+        moves[(moves['Pokemon'] == pokemon) & (moves['Month'] == month)].sort_values('Usage %', ascending=False)
+    scan = (time.perf_counter() - begin) / len(queries)
+    begin = time.perf_counter()
+    for pokemon, month in queries:
+        index.lookup('moves', pokemon, 'gen9ou', 1000, month)
+    indexed = (time.perf_counter() - begin) / len(queries)
+    shutil.rmtree(root)
+    print(f"moveset_store: {sum(map(len, tables.values()))} rows, {len(names)} names, "
+          f"CSV {csv_bytes / 2**20:.1f} MiB vs store {store_bytes / 2**20:.1f} MiB, "
+          f"lookup {scan * 1000:.2f} ms scan vs {indexed * 1000:.3f} ms indexed")
+
+
+def bench_backfill(n_files=24, rate=20.0):
+    # End to end moveset backfill from a local server: the old fetch-then-parse loop vs the downloader feeding
+    # parser processes. rate stands in for the real 1 request/s; both modes are held to it. Set MOVESET_DIR to a
+    # folder of saved Smogon moveset .txt files to replay those instead of synthetic ones.
+    directory = os.environ.get('MOVESET_DIR')
+    if directory is None:
+        directory = tempfile.mkdtemp()
+        for i in range(n_files):
+            with open(f"{directory}/gen9tier{i}-0.txt", 'w', encoding='utf-8') as f:
+                f.write(make_moveset_text(seed=i))
+    files = sorted(name for name in os.listdir(directory) if name.endswith('.txt'))
+    handler = type('Handler', (SavedFileHandler,), {'directory': directory})
+    server, base = start_server(handler)
+    jobs = {f"{base}/stats/2024-01/moveset/{name}": ('2024-01', name.rsplit('-', 1)[0], '0') for name in files}
+
+    results = {}
+    timings = {}
+    fetcher = Fetcher(max_workers=1, rate=rate)
+    begin = time.perf_counter()
+    results['serial'] = [parse_moveset_file(*jobs[url], fetcher.fetch(url)) for url in jobs]
+    timings['serial'] = time.perf_counter() - begin
+    fetcher.close()
+    for workers in sorted({1, os.cpu_count()}):
+        fetcher = Fetcher(max_workers=1, rate=rate)
+        begin = time.perf_counter()
+        results[workers] = [tables for _, tables, _ in iter_parsed_files(fetcher, jobs, workers)]
+        timings[workers] = time.perf_counter() - begin
+        fetcher.close()
+    server.shutdown()
+    if 'MOVESET_DIR' not in os.environ:
+        shutil.rmtree(directory)
+
+    for workers in timings:
+        for old, new in zip(results['serial'], results[workers]):
+            for section in old:
+                pd.testing.assert_frame_equal(old[section], new[section])
+    print(f"backfill: {len(files)} files at {rate:g} req/s, fetch-then-parse {timings.pop('serial'):.2f}s, " +
+          ", ".join(f"pipeline with {workers} parser(s) {elapsed:.2f}s" for workers, elapsed in timings.items()) +
+          f" (download floor {len(files) / rate:.2f}s)")
+
+
+def add_pokemon_details_map(df_final, sprite_links, pokemon_stats):
+    # The per-column map() widening rotomScraper.py did before build_species, kept as the reference
+    # Normalize the 'Name' and Stats columns in each DataFrame
+    sprite_links['Name'] = sprite_links['Name'].str.strip().str.title()
+    df_final['Name'] = df_final['Name'].str.strip().str.title()
+    pokemon_stats['Name'] = pokemon_stats['Name'].str.strip().str.title()
+    pokemon_stats['HP'] = pokemon_stats['HP'].astype(str)
+    pokemon_stats['HP'] = pokemon_stats['HP'].str.strip().str.title()
+
+    # Recreate the mapping Series with normalized names
+    name_to_image_url = sprite_links.set_index('Name')['Image URL']
+    pokemon_stats_unique = pokemon_stats.drop_duplicates(subset='Name', keep='first')
+    hp = pokemon_stats_unique.set_index('Name')['HP']
+    attack = pokemon_stats_unique.set_index('Name')['Attack']
+    defense = pokemon_stats_unique.set_index('Name')['Defense']
+    sp_attack = pokemon_stats_unique.set_index('Name')['Sp.Attack']
+    sp_defense = pokemon_stats_unique.set_index('Name')['Sp.Defense']
+    speed = pokemon_stats_unique.set_index('Name')['Speed']
+    type_one = pokemon_stats_unique.set_index('Name')['Type1']
+    type_two = pokemon_stats_unique.set_index('Name')['Type2']
+
+    # Map the 'Name' column in df_final to 'Sprite Links' using the created mapping Series
+    df_final['Sprite Links'] = df_final['Name'].map(name_to_image_url)
+    df_final['HP'] = df_final['Name'].map(hp)
+    df_final['Attack'] = df_final['Name'].map(attack)
+    df_final['Defense'] = df_final['Name'].map(defense)
+    df_final['Sp.Attack'] = df_final['Name'].map(sp_attack)
+    df_final['Sp.Defense'] = df_final['Name'].map(sp_defense)
+    df_final['Speed'] = df_final['Name'].map(speed)
+    df_final['Type1'] = df_final['Name'].map(type_one)
+    df_final['Type2'] = df_final['Name'].map(type_two)
+
+    # Get BST of each pokemon
+    columns_to_sum = ['HP', 'Attack', 'Defense', "Sp.Attack", "Sp.Defense", "Speed"]
+
+    # Convert columns to numeric, forcing any errors to NaN
+    df_final[columns_to_sum] = df_final[columns_to_sum].apply(pd.to_numeric, errors='coerce')
+    df_final['BST'] = df_final[columns_to_sum].sum(axis=1)
+
+    # Convert entire 'Month' column to datetime format
+    df_final['Month'] = pd.to_datetime(df_final['Month'], format='%Y-%m')
+    df_final['Month'] = df_final['Month'].dt.strftime('%Y-%m')
+    # Convert entire 'Usage' column to numeric
+    df_final['Usage Rate'] = df_final['Usage Rate'].str.replace('%', '')
+    df_final['Usage Rate'] = df_final['Usage Rate'].apply(pd.to_numeric)
+    return df_final
+
+
+def bench_species(n_months=26):
+    # Scraper post-processing: nine map() calls and BST over every usage row vs building the species table once
+    # and storing narrow rows with a Species ID. Compares time, the stored size, and the widened result.
+    tiers = ['gen9ubers', 'gen9ou', 'gen9uu', 'gen9ru', 'gen9nu', 'gen9pu', 'gen9zu',
+             'gen8ou', 'gen7ou', 'gen6ou', 'gen5ou', 'gen4ou', 'gen3ou', 'gen2ou', 'gen1ou']
+    wide = make_usage_frame(n_months=n_months, tiers=tiers, rankings=(0, 1500, 1760))
+    pokemon_stats = wide.drop_duplicates('Name')[['Name', 'Type1', 'Type2', 'HP', 'Attack', 'Defense', 'Sp.Attack',
+                                                  'Sp.Defense', 'Speed']].reset_index(drop=True)
+    sprite_links = wide.drop_duplicates('Name')[['Name', 'Sprite Links']].rename(columns={'Sprite Links': 'Image URL'})
+    # What scrape_usage returns: strings straight out of the usage files
+    scraped = wide[['Rank', 'Name', 'Usage Rate', 'Raw Usage', 'Raw %', 'Tier', 'Month', 'Ranking']].astype(str)
+    scraped['Usage Rate'] = scraped['Usage Rate'] + '%'
+
+    work_dir = tempfile.mkdtemp()
+    begin = time.perf_counter()
+    old = prepare_usage_dtypes(add_pokemon_details_map(scraped.copy(), sprite_links.copy(), pokemon_stats.copy()))
+    old_time = time.perf_counter() - begin
+    write_usage_store(old, f"{work_dir}/wide")
+
+    begin = time.perf_counter()
+    facts = prepare_usage_dtypes(clean_usage_rows(scraped.copy()))
+    species = build_species(facts['Name'].cat.categories, sprite_links, pokemon_stats)
+    facts['Species ID'] = facts['Name'].cat.codes.astype('int16')
+    new_time = time.perf_counter() - begin
+    write_usage_store(facts, f"{work_dir}/narrow", species=species)
+
+    sizes = {name: sum(os.path.getsize(os.path.join(folder, file))
+                       for folder, _, files in os.walk(f"{work_dir}/{name}") for file in files) / 2**20
+             for name in ['wide', 'narrow']}
+    widened = load_usage_data(f"{work_dir}/narrow").drop(columns='Species ID')
+    shutil.rmtree(work_dir)
+    pd.testing.assert_frame_equal(old.drop(columns='Sprite Links').reset_index(drop=True),
+                                  widened[old.columns.drop('Sprite Links')], check_dtype=False, check_categorical=False)
+    assert (old['Sprite Links'].astype(str) == widened['Sprite Links'].astype(str)).all()
+    old_mib = old.memory_usage(deep=True).sum() / 2**20
+    new_mib = (facts.memory_usage(deep=True).sum() + species.memory_usage(deep=True).sum()) / 2**20
+    print(f"species: {len(facts)} rows, {len(species)} species, map() {old_time:.2f}s ({old_mib:.0f} MiB), "
+          f"dimension table {new_time:.2f}s ({new_mib:.0f} MiB), "
+          f"store {sizes['wide']:.1f} MiB wide vs {sizes['narrow']:.1f} MiB narrow")
+
+
+def bench_stats(n_months=26, clicks=50):
+    # Stats box on a line graph click: the old scan of df_final for the Pokemon's first row plus px.bar vs
+    # SpeciesIndex's lookup into a figure rendered once
+    import plotly.express as px
+
+    df = prepare_usage_dtypes(make_usage_frame(n_months=n_months))
+    species = split_species(df)[1]
+    names = list(np.random.default_rng(0).choice(species.index, size=clicks))
+
+    def old_stats_figure(pokemon_name):
+        stats_data = df[df['Name'] == pokemon_name][STAT_COLUMNS].iloc[0]
+        fig = px.bar(pd.DataFrame({'Stat': stats_data.index, 'Value': stats_data.values}), x='Stat', y='Value',
+                     title=f'Stats for {pokemon_name}')
+        fig.update_layout(template='plotly_dark', yaxis_title=None, xaxis_title=None, title="")
+        return fig
+
+    begin = time.perf_counter()
+    for name in names:
+        old_stats_figure(name)
+    old_time = (time.perf_counter() - begin) / clicks
+    begin = time.perf_counter()
+    species_index = SpeciesIndex(species)
+    build_time = time.perf_counter() - begin
+    begin = time.perf_counter()
+    for name in names:
+        species_index.stats_figure(name)
+    new_time = (time.perf_counter() - begin) / clicks
+
+    assert species_index.stat_values(names[0]) == old_stats_figure(names[0]).data[0].y.tolist()
+    print(f"stats: {len(df)} rows, {len(species)} species, scan + px.bar {old_time * 1000:.1f} ms per click, "
+          f"SpeciesIndex {new_time * 1000:.3f} ms per click (built in {build_time * 1000:.0f} ms)")
+
+
+def report_startup():
+    # Runs in a fresh interpreter inside a store directory: seconds to import app, to answer the first request,
+    # and until every tier is loaded, then the import time of the Gemini SDK app no longer loads at startup
+    begin = time.perf_counter()
+    import app
+    imported = time.perf_counter() - begin
+    app.server.test_client().get('/')
+    first_request = time.perf_counter() - begin
+    app.all_tiers_loaded.wait()
+    all_tiers = time.perf_counter() - begin
+    begin = time.perf_counter()
+    import google.generativeai  # noqa: F401
+    print(f"{imported:.2f} {first_request:.2f} {all_tiers:.2f} {time.perf_counter() - begin:.2f}")
+
+
+def bench_startup(n_months=26):
+    # App cold start with 15 tiers: eager load of every tier vs the default tier first, in fresh interpreters
+    tiers = ['gen9ubers', 'gen9ou', 'gen9uu', 'gen9ru', 'gen9nu', 'gen9pu', 'gen9zu',
+             'gen8ou', 'gen7ou', 'gen6ou', 'gen5ou', 'gen4ou', 'gen3ou', 'gen2ou', 'gen1ou']
+    df = prepare_usage_dtypes(make_usage_frame(n_months=n_months, tiers=tiers, rankings=(0, 1500, 1760)))
+    work_dir = tempfile.mkdtemp()
+    write_usage_store(df, f"{work_dir}/usage_data")
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+
+    begin = time.perf_counter()
+    UsageIndex(load_usage_tables(f"{work_dir}/usage_data")[0])
+    eager_time = time.perf_counter() - begin
+    begin = time.perf_counter()
+    UsageIndex(load_usage_tables(f"{work_dir}/usage_data", tiers=['gen9ou'])[0])
+    default_time = time.perf_counter() - begin
+
+    output = subprocess.run([sys.executable, '-c', f"import sys; sys.path.insert(0, {repo_dir!r}); "
+                             f"import benchmarks; benchmarks.report_startup()"],
+                            capture_output=True, text=True, check=True, cwd=work_dir)
+    shutil.rmtree(work_dir)
+    imported, first_request, all_tiers, genai_time = output.stdout.split()[-4:]
+    print(f"startup: {len(df)} rows, loading every tier {eager_time:.2f}s vs gen9ou first {default_time:.2f}s; "
+          f"app import {imported}s, first request {first_request}s, all tiers {all_tiers}s, "
+          f"deferred genai import {genai_time}s")
+
+
+def old_parse_usage_text(text):
+    # scrape_usage's parsing before usage_parser.py, plus the numeric conversion clean_usage_rows did afterwards
+    new_df = pd.read_csv(io.StringIO(text))
+    new_df.columns = ['All']
+    new_df = new_df.drop([0, 1, 2, 3, ])
+    split_lines = new_df['All'].str.split('|', n=7, expand=True)
+    new_df['Rank'] = split_lines[1]
+    new_df['Name'] = split_lines[2]
+    new_df['Usage Rate'] = split_lines[3]
+    new_df['Raw Usage'] = split_lines[4]
+    new_df['Raw %'] = split_lines[5]
+    new_df['Real Usage'] = split_lines[6]
+    new_df['Real %'] = split_lines[7]
+    new_df.drop(columns=["All"], inplace=True)
+    new_df.dropna(inplace=True)
+    new_df = new_df.drop(columns=['Real Usage', 'Real %'])
+    new_df['Name'] = new_df['Name'].str.strip()
+    new_df['Usage Rate'] = pd.to_numeric(new_df['Usage Rate'].str.replace('%', ''))
+    return new_df
+
+
+def bench_parse(repeats=5):
+    # Parsing saved usage files of different sizes: read_csv + str.split vs parse_usage_text
+    work_dir = tempfile.mkdtemp()
+    files = {'gen9ou': 1200, 'gen9ubers': 800, 'gen9uu': 600, 'gen9zu': 300, 'gen1ou': 150}
+    for tier, rows in files.items():
+        with open(f"{work_dir}/{tier}-0.txt", 'w', encoding='utf-8') as f:
+            f.write(make_usage_text(tier, rows=rows))
+    texts = []
+    for name in sorted(os.listdir(work_dir)):
+        with open(os.path.join(work_dir, name), encoding='utf-8') as f:
+            texts.append(f.read())
+    shutil.rmtree(work_dir)
+
+    timings = {}
+    for label, parse in [('read_csv', old_parse_usage_text), ('parse_usage_text', parse_usage_text)]:
+        begin = time.perf_counter()
+        for _ in range(repeats):
+            results = [parse(text) for text in texts]
+        timings[label] = (time.perf_counter() - begin) / repeats
+        timings[label + ' rows'] = sum(len(df) for df in results)
+    old, new = old_parse_usage_text(texts[0]), parse_usage_text(texts[0])
+    assert (old['Name'].tolist() == new['Name'].tolist()
+            and np.allclose(old['Usage Rate'].to_numpy(float), new['Usage Rate'])
+            and (pd.to_numeric(old['Rank']).to_numpy() == new['Rank'].to_numpy()).all())
+    assert timings['read_csv rows'] == timings['parse_usage_text rows']
+    try:
+        parse_usage_text(texts[0].replace('| Usage % ', '| Usage   '))
+        raise AssertionError("changed header wasn't caught")
+    except UsageFormatError:
+        pass
+    print(f"parse: {len(texts)} files, {timings['read_csv rows']} rows, "
+          f"read_csv + split {timings['read_csv'] * 1000:.1f} ms, parse_usage_text {timings['parse_usage_text'] * 1000:.1f} ms")
+
+
+def bench_movers(n_months=26, top_n=25, repeats=20):
+    # Meta summary data: latest and previous month top N selected and joined per request (the old
+    # build_summary_prompt) vs the rows of the movers table computed at scrape time
+    tiers = ['gen9ubers', 'gen9ou', 'gen9uu', 'gen9ru', 'gen9nu', 'gen9pu', 'gen9zu',
+             'gen8ou', 'gen7ou', 'gen6ou', 'gen5ou', 'gen4ou', 'gen3ou', 'gen2ou', 'gen1ou']
+    df = prepare_usage_dtypes(make_usage_frame(n_months=n_months, tiers=tiers, rankings=(0, 1500, 1760)))
+    facts, species = split_species(df)
+    usage_index = UsageIndex(facts)
+    columns = ['Name', 'Usage Rate', 'Tier', 'Type1', 'Type2', 'BST', 'Month']
+    selections = [(tier, ranking) for tier in ['gen9ou', 'gen1ou'] for ranking in [1000, 1760]]
+
+    def old_tables(tier, ranking):
+        latest_month = usage_index.latest_month(tier, ranking)
+        latest_data = join_species(usage_index.top_n(tier, ranking, top_n, latest_month), species)
+        prev_month = latest_month - pd.DateOffset(months=1)
+        prev_data = join_species(usage_index.top_n(tier, ranking, top_n, prev_month), species)
+        return latest_data[columns].to_markdown(index=False), prev_data[columns].to_markdown(index=False)
+
+    begin = time.perf_counter()
+    movers = index_movers(compute_movers(facts))
+    build_time = time.perf_counter() - begin
+
+    def new_tables(tier, ranking):
+        month_movers = movers[(tier, ranking, usage_index.latest_month(tier, ranking))]
+        latest_data = join_species(month_movers[month_movers['Status'] != 'exited'].head(top_n), species,
+                                   ['Type1', 'Type2', 'BST'])
+        exited = month_movers[(month_movers['Status'] == 'exited') & (month_movers['Previous Rank'] <= top_n)]
+        return (latest_data[['Name', 'Usage Rate', 'Previous Usage', 'Usage Change', 'Rank Change', 'Trend', 'Type1',
+                             'Type2', 'BST']].to_markdown(index=False),
+                exited[['Name', 'Previous Usage', 'Previous Rank']].to_markdown(index=False))
+
+    timings = {}
+    for label, tables in [('old', old_tables), ('movers', new_tables)]:
+        begin = time.perf_counter()
+        for _ in range(repeats):
+            for tier, ranking in selections:
+                tables(tier, ranking)
+        timings[label] = (time.perf_counter() - begin) / (repeats * len(selections))
+    print(f"movers: {len(facts)} rows, table built in {build_time:.2f}s, prompt data per request "
+          f"{timings['old'] * 1000:.1f} ms old vs {timings['movers'] * 1000:.1f} ms from movers")
+
+
+def bench_sprites(n_species=300, n_distinct=200, rate=50.0):
+    # Sprite pipeline against a local server: first download of every link, then a re-run that only finds
+    # links it already has. Forms sharing artwork come from different URLs but end up in one file.
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    directory = tempfile.mkdtemp()
+    for i in range(n_distinct):
+        pixels = rng.integers(0, 255, size=(56, 68, 4), dtype=np.uint8)
+        Image.fromarray(pixels, 'RGBA').save(f"{directory}/art{i}.png")
+    for i in range(n_distinct, n_species):
+        shutil.copy(f"{directory}/art{i % n_distinct}.png", f"{directory}/art{i}.png")
+    handler = type('Handler', (SavedFileHandler,), {'directory': directory})
+    server, base = start_server(handler)
+    urls = [f"{base}/sprites/art{i}.png" for i in range(n_species)] + [f"{base}/sprites/missing.png", None]
+
+    sprite_dir = tempfile.mkdtemp()
+    timings = {}
+    for run in ['first', 'rerun']:
+        fetcher = Fetcher(max_workers=8, rate=rate)
+        cache = SpriteCache(sprite_dir)
+        begin = time.perf_counter()
+        added = cache.update(urls, fetcher)
+        timings[run] = (time.perf_counter() - begin, added)
+        fetcher.close()
+    server.shutdown()
+
+    files = [name for name in os.listdir(sprite_dir) if name.endswith('.png')]
+    size = sum(os.path.getsize(os.path.join(sprite_dir, name)) for name in files) / 2**20
+    assert len(files) == n_distinct and timings['rerun'][1] == 0
+    shutil.rmtree(directory)
+    shutil.rmtree(sprite_dir)
+    print(f"sprites: {n_species} links -> {len(files)} files ({size:.1f} MiB), "
+          f"first run {timings['first'][0]:.2f}s ({timings['first'][1]} added), "
+          f"rerun {timings['rerun'][0] * 1000:.1f} ms ({timings['rerun'][1]} added)")
+
+
+def import_app(df):
+    # Imports app.py with df as its usage store. app reads its data from the working directory at import.
+    work_dir = tempfile.mkdtemp()
+    write_usage_store(prepare_usage_dtypes(df), f"{work_dir}/usage_data")
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    return app, work_dir
+
+
+def bench_window(n_months=72, top_n=25, repeats=5):
+    # Line graph for a date range: the serialized figure the browser downloads, and the time to build it, when
+    # only the selected months are sliced out on the server vs sending every month
+    df = make_usage_frame(n_months=n_months, tiers=['gen9ou'], rankings=(0, 1825))
+    app, work_dir = import_app(df)
+    months = sorted(df['Month'].unique())
+
+    results = []
+    for n in [6, 12, 24, None]:
+        start, end = (months[-n], months[-1]) if n else (None, None)
+        start_month, end_month = app.to_month(start), app.to_month(end)
+        begin = time.perf_counter()
+        for _ in range(repeats):
+            fig = app.build_usage_graph('gen9ou', top_n, 1000, start_month, end_month)
+        build_time = (time.perf_counter() - begin) / repeats
+        results.append((f"{n} months" if n else f"all {n_months} months", len(fig.to_json()), build_time))
+    shutil.rmtree(work_dir)
+    print(f"window: top {top_n}, " + ", ".join(
+        f"{label} {size / 1024:.0f} KiB in {build_time * 1000:.0f} ms" for label, size, build_time in results))
+
+
+def bench_aggregate(n_months=72, top_n=25, repeats=5):
+    # Line graph in each aggregation mode: serialized figure size, points drawn and build time
+    app, work_dir = import_app(make_usage_frame(n_months=n_months, tiers=['gen9ou'], rankings=(0, 1825)))
+    results = []
+    for aggregation in ['month', 'quarter', 'rolling', 'envelope']:
+        begin = time.perf_counter()
+        for _ in range(repeats):
+            fig = app.build_usage_graph('gen9ou', top_n, 1000, aggregation=aggregation)
+        build_time = (time.perf_counter() - begin) / repeats
+        points = sum(len(trace.x) for trace in fig.data)
+        results.append((aggregation, len(fig.to_json()), points, fig.data[-1].type, build_time))
+    shutil.rmtree(work_dir)
+    print(f"aggregate: top {top_n} over {n_months} months, " + ", ".join(
+        f"{aggregation} {size / 1024:.0f} KiB / {points} points ({trace_type}) in {build_time * 1000:.0f} ms"
+        for aggregation, size, points, trace_type, build_time in results))
+
+
+BENCHMARKS = {
+    'fetch': bench_fetch,
+    'cache': bench_cache,
+    'load': bench_load,
+    'index': bench_index,
+    'fill': bench_fill,
+    'summary': bench_summary,
+    'moveset': bench_moveset,
+    'moveset_store': bench_moveset_store,
+    'backfill': bench_backfill,
+    'memory': bench_memory,
+    'shared': bench_shared,
+    'species': bench_species,
+    'sprites': bench_sprites,
+    'stats': bench_stats,
+    'startup': bench_startup,
+    'parse': bench_parse,
+    'movers': bench_movers,
+    'window': bench_window,
+    'aggregate': bench_aggregate,
+}
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
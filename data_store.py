@@ -0,0 +1,354 @@
+import glob
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+from moveset_parser import SECTION_COLUMNS
+
+# Columnar copy of the scraped usage data, one Parquet file per Tier/Ranking partition
+USAGE_STORE_PATH = 'usage_data'
+# Species dimension inside the usage store, the leading underscore keeps Parquet readers from taking it for a partition
+SPECIES_FILE = '_species.parquet'
+# Arrow IPC copy of the usage and species tables that app workers memory-map instead of each loading their own
+SHARED_DATASET_PATH = 'usage_shared'
+# Older deployments only have the Excel export
+EXCEL_PATH = 'sample_data.xlsx'
+# Precomputed "Interesting Insights", see insights.py
+INSIGHTS_PATH = 'insights.parquet'
+# Month-over-month changes per Pokemon, see movers.py
+MOVERS_PATH = 'movers.parquet'
+# Every moveset section as its own dictionary-encoded table, see write_moveset_store
+MOVESET_STORE_PATH = 'moveset_data'
+# CSV exports of the teammates and checks sections
+TEAMMATES_PATH = 'smogon_teammates_data.csv'
+CHECKS_PATH = 'smogon_checks_data.csv'
+
+# Seconds after which a lock file is taken to be left over from a process that died holding it
+LOCK_STALE = 600
+
+PARTITION_COLUMNS = ['Tier', 'Ranking']
+# Columns that only depend on the Pokemon, so the app keeps them once per species instead of on every usage row
+STAT_COLUMNS = ['HP', 'Attack', 'Defense', 'Sp.Attack', 'Sp.Defense', 'Speed']
+SPECIES_COLUMNS = ['Sprite Links', 'Type1', 'Type2'] + STAT_COLUMNS + ['BST']
+
+
+def prepare_usage_dtypes(df):
+    # Give the scraped columns proper dtypes so they are cheap to store, load and filter
+    df = df.drop(columns=[col for col in df.columns if col.startswith('Unnamed')])
+    df['Name'] = df['Name'].astype(str).str.strip().astype('category')
+    df['Tier'] = df['Tier'].astype(str).astype('category')
+    df['Month'] = pd.to_datetime(df['Month'])
+    # Smogon calls the base ladder 0 but the app's dropdowns label it 1000
+    df['Ranking'] = pd.to_numeric(df['Ranking']).replace(0, 1000).astype('int16')
+    df['Rank'] = pd.to_numeric(df['Rank']).astype('int16')
+    df['Raw Usage'] = pd.to_numeric(df['Raw Usage']).astype('int32')
+    if not pd.api.types.is_numeric_dtype(df['Raw %']):
+        df['Raw %'] = df['Raw %'].astype(str).str.strip().str.rstrip('%')
+    df['Raw %'] = pd.to_numeric(df['Raw %'], errors='coerce').astype('float32')
+    df['Usage Rate'] = pd.to_numeric(df['Usage Rate']).astype('float32')
+    df = species_dtypes(df)
+    return df.sort_values(['Tier', 'Ranking', 'Month', 'Rank'], ignore_index=True)
+
+
+def species_dtypes(df):
+    # Types and sprite links as categoricals, base stats as int16. Pokemon missing from the stats sheet have
+    # no stats, hence the nullable Int16.
+    for col in ['Sprite Links', 'Type1', 'Type2']:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col in STAT_COLUMNS + ['BST']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').round().astype('Int16')
+    return df
+
+
+def split_species(df):
+    # (usage rows without the species columns, one row of species columns per Pokemon indexed by Name)
+    columns = [col for col in SPECIES_COLUMNS if col in df.columns]
+    species = df.drop_duplicates('Name')[['Name'] + columns]
+    species = species.assign(Name=species['Name'].astype(str)).set_index('Name')
+    return df.drop(columns=columns), species
+
+
+def join_species(df, species, columns=None):
+    # Puts species columns back onto usage rows, just the ones the caller needs
+    columns = list(species.columns) if columns is None else columns
+    return df.join(species[columns], on='Name')
+
+
+def write_usage_store(df, path=USAGE_STORE_PATH, species=None):
+    # Write into a scratch directory first so readers never see a half written store. species is the dimension
+    # table from rotomScraper.build_species that df's 'Species ID' column points into, swapped in together.
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    df.to_parquet(tmp_path, partition_cols=PARTITION_COLUMNS, index=False)
+    if species is not None:
+        species.to_parquet(os.path.join(tmp_path, SPECIES_FILE), index=True)
+    replace_directory(tmp_path, path)
+
+
+def replace_directory(tmp_path, path):
+    # Swap a freshly written directory in for the old one
+    old_path = path + '.old'
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+@contextmanager
+def lock_file(path, poll=0.2, stale=LOCK_STALE):
+    # Holds <path>.lock so only one process at a time (e.g. one of several app workers) writes path, the others
+    # wait for it to be released. Callers should check again whether the write is still needed once they hold it.
+    lock_path = path + '.lock'
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.stat(lock_path).st_mtime > stale:
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(poll)
+    try:
+        yield
+    finally:
+        os.remove(lock_path)
+
+
+def dataset_version(path=USAGE_STORE_PATH, excel_path=EXCEL_PATH):
+    # Changes whenever the scraper writes a new dataset, for invalidating anything built from the old one
+    target = path if os.path.exists(path) else excel_path
+    return os.stat(target).st_mtime_ns if os.path.exists(target) else None
+
+
+def load_usage_facts(path=USAGE_STORE_PATH, excel_path=EXCEL_PATH, tiers=None):
+    # The usage rows as stored: narrow with a 'Species ID' column, or wide for stores scraped before the species
+    # table existed (and the Excel export). Only the given tiers' rows if tiers is set, other partitions aren't read.
+    if not os.path.exists(path):
+        df = pd.read_excel(excel_path)
+        return prepare_usage_dtypes(df if tiers is None else df[df['Tier'].isin(tiers)])
+    df = pd.read_parquet(path, filters=None if tiers is None else [('Tier', 'in', list(tiers))])
+    # Arrow holds on to the buffers it read into, hand them back so each worker only keeps the DataFrame
+    pa.default_memory_pool().release_unused()
+    # Partition columns come back as dictionary-encoded strings
+    df['Tier'] = df['Tier'].astype(str).astype('category')
+    df['Ranking'] = df['Ranking'].astype('int16')
+    # Stores written before the species columns were compacted
+    df['Raw Usage'] = df['Raw Usage'].astype('int32')
+    return species_dtypes(df)
+
+
+def load_species(path=USAGE_STORE_PATH):
+    # Species dimension indexed by Species ID, or None for a store that doesn't have one
+    species_path = os.path.join(path, SPECIES_FILE)
+    if not os.path.exists(species_path):
+        return None
+    return species_dtypes(pd.read_parquet(species_path))
+
+
+def widen_usage(df, species):
+    # Every usage row with its species columns, gathered by Species ID in one take
+    details = species[SPECIES_COLUMNS].iloc[df['Species ID'].to_numpy()].reset_index(drop=True)
+    return pd.concat([df.reset_index(drop=True), details], axis=1)
+
+
+def load_usage_data(path=USAGE_STORE_PATH, excel_path=EXCEL_PATH):
+    # One wide DataFrame, species columns on every row
+    df = load_usage_facts(path, excel_path)
+    species = load_species(path) if os.path.exists(path) else None
+    if species is None or 'Species ID' not in df.columns:
+        return df
+    return widen_usage(df, species)
+
+
+def load_usage_tables(path=USAGE_STORE_PATH, excel_path=EXCEL_PATH, tiers=None):
+    # Compact in-memory layout for the app: (usage, species indexed by Name), see split_species
+    df = load_usage_facts(path, excel_path, tiers)
+    species = load_species(path) if os.path.exists(path) else None
+    if species is None or 'Species ID' not in df.columns:
+        return split_species(df)
+    return df, species.set_index('Name')
+
+
+def write_shared_dataset(usage, species, path=SHARED_DATASET_PATH):
+    # Writes a new version of the shared dataset next to the old one, then points CURRENT at it. Workers that
+    # mapped the old files keep reading them until they attach again. Returns the new version.
+    os.makedirs(path, exist_ok=True)
+    version = time.time_ns()
+    # The order UsageIndex wants, so workers can slice the mapped file without copying it
+    usage = usage.sort_values(['Tier', 'Ranking', 'Month', 'Usage Rate'], ascending=[True, True, True, False])
+    for name, df in [('usage', usage), ('species', species.reset_index())]:
+        table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+        with pa.OSFile(os.path.join(path, f'{name}-{version}.arrow'), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    pointer = os.path.join(path, 'CURRENT')
+    previous = shared_dataset_version(path)
+    with open(pointer + '.tmp', 'w') as f:
+        f.write(str(version))
+    os.replace(pointer + '.tmp', pointer)
+
+    # Keep the previous version around for workers that read CURRENT just before the swap
+    for file in glob.glob(os.path.join(path, '*.arrow')):
+        if not file.endswith((f'-{version}.arrow', f'-{previous}.arrow')):
+            try:
+                os.remove(file)
+            except OSError:
+                # Still mapped somewhere on Windows, next write gets it
+                pass
+    return version
+
+
+def shared_dataset_version(path=SHARED_DATASET_PATH):
+    # None if nothing has been written yet
+    try:
+        with open(os.path.join(path, 'CURRENT')) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def attach_shared_dataset(path=SHARED_DATASET_PATH):
+    # (usage, species, version) backed by the memory-mapped files: the numeric columns and categorical codes
+    # point straight into the page cache shared by every worker, nothing is copied. The arrays are read-only.
+    version = shared_dataset_version(path)
+    if version is None:
+        return None
+    tables = {}
+    for name in ['usage', 'species']:
+        source = pa.memory_map(os.path.join(path, f'{name}-{version}.arrow'))
+        tables[name] = pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+    return tables['usage'], tables['species'].set_index('Name'), version
+
+
+def write_insights(insights, path=INSIGHTS_PATH):
+    tmp_path = path + '.tmp'
+    insights.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def load_insights(path=INSIGHTS_PATH):
+    # None if the scraper hasn't written the table yet
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+def write_movers(movers, path=MOVERS_PATH):
+    tmp_path = path + '.tmp'
+    movers.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def load_movers(path=MOVERS_PATH):
+    # None if the scraper hasn't written the table yet
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+class NameDictionary:
+    # Stable integer IDs for every Pokemon, ability, item, spread, move and tera type name in the moveset
+    # tables. IDs are handed out in first-seen order and never change, so an incremental scrape can keep
+    # extending the dictionary it loaded.
+    def __init__(self, names=()):
+        self.names = list(names)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def encode(self, values):
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        unique_ids = np.empty(len(uniques), dtype='int32')
+        for i, name in enumerate(uniques):
+            if name not in self.ids:
+                self.ids[name] = len(self.names)
+                self.names.append(name)
+            unique_ids[i] = self.ids[name]
+        return unique_ids[codes]
+
+    def decode(self, ids):
+        return np.asarray(self.names, dtype=object)[np.asarray(ids)]
+
+    def lookup(self, name):
+        # None for a name that never appeared in a moveset file
+        return self.ids.get(name)
+
+
+def encode_moveset_table(df, section, names):
+    # Parser output (plus Month, Tier and Rating columns) -> compact table keyed by IDs.
+    # The Pokemon column becomes 'Pokemon ID' and the section's value column e.g. 'Item' becomes 'Item ID'.
+    pokemon_column, value_column = SECTION_COLUMNS[section][:2]
+    encoded = pd.DataFrame({
+        'Pokemon ID': names.encode(df[pokemon_column]),
+        f'{value_column} ID': names.encode(df[value_column]),
+        'Usage %': pd.to_numeric(df['Usage %']).astype('float32'),
+        'Month': pd.to_datetime(df['Month']),
+        'Tier': df['Tier'].astype(str).astype('category'),
+        # Smogon calls the base ladder 0 but the app's dropdowns label it 1000
+        'Rating': pd.to_numeric(df['Rating']).replace(0, 1000).astype('int16'),
+    })
+    if section == 'checks':
+        encoded['Performance'] = df['Performance'].to_numpy()
+    return encoded
+
+
+def decode_moveset_table(encoded, section, names):
+    # Inverse of encode_moveset_table, back to the parser's column names
+    pokemon_column, value_column = SECTION_COLUMNS[section][:2]
+    df = encoded.rename(columns={'Pokemon ID': pokemon_column, f'{value_column} ID': value_column})
+    df[pokemon_column] = names.decode(df[pokemon_column])
+    df[value_column] = names.decode(df[value_column])
+    return df
+
+
+def write_moveset_store(tables, names, path=MOVESET_STORE_PATH):
+    # tables is {section: encoded DataFrame}. Each section gets its own Parquet dataset partitioned by Tier,
+    # next to names.parquet holding the ID -> name dictionary.
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    pd.DataFrame({'Name': names.names}).to_parquet(os.path.join(tmp_path, 'names.parquet'), index=False)
+    for section, df in tables.items():
+        df = df.sort_values(['Tier', 'Rating', 'Month', 'Pokemon ID', 'Usage %'],
+                            ascending=[True, True, True, True, False], ignore_index=True)
+        df.to_parquet(os.path.join(tmp_path, section), partition_cols=['Tier'], index=False)
+    replace_directory(tmp_path, path)
+
+
+def load_moveset_names(path=MOVESET_STORE_PATH):
+    names_path = os.path.join(path, 'names.parquet')
+    if not os.path.exists(names_path):
+        return NameDictionary()
+    return NameDictionary(pd.read_parquet(names_path)['Name'].tolist())
+
+
+def load_moveset_section(section, tier=None, path=MOVESET_STORE_PATH):
+    # One section's encoded table, optionally just one tier's partition. None if it hasn't been scraped.
+    section_path = os.path.join(path, section)
+    if not os.path.exists(section_path):
+        return None
+    filters = [('Tier', '==', tier)] if tier is not None else None
+    df = pd.read_parquet(section_path, filters=filters)
+    df['Tier'] = df['Tier'].astype(str).astype('category')
+    return df
+
+
+def write_moveset_store_from_csv(teammates_path=TEAMMATES_PATH, checks_path=CHECKS_PATH, path=MOVESET_STORE_PATH):
+    # One-off conversion for data scraped before the store existed, it only has teammates and checks
+    names = NameDictionary()
+    tables = {section: encode_moveset_table(pd.read_csv(csv_path, dtype={'Month': str}), section, names)
+              for section, csv_path in [('teammates', teammates_path), ('checks', checks_path)]}
+    write_moveset_store(tables, names, path)
@@ -1,115 +1,181 @@
-import re
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-import requests
 from dateutil.relativedelta import relativedelta
 from datetime import datetime
-import time
+
+from data_store import (CHECKS_PATH, MOVESET_STORE_PATH, TEAMMATES_PATH, decode_moveset_table, encode_moveset_table,
+                        load_moveset_names, load_moveset_section, write_moveset_store)
+from fetcher import Fetcher
+from manifest import ScrapeManifest
+from moveset_parser import SECTION_COLUMNS, iter_text_lines, parse_moveset, parse_moveset_sections
+from response_cache import ResponseCache
 
 def extract_teammates_and_checks(text):
-    teammates_data = []
-    checks_data = []
-
-    sections = re.split(r'\+\-+\+\s*\n\s*\|\s*(.*?)\s*\|\s*\n\s*\+\-+\+', text)
-
-    for name, block in zip(sections[1::2], sections[2::2]):
-        current_pokemon = name.strip()
-        lines = block.splitlines()
-        section = None
-
-        for line in lines:
-            line = line.strip()
-
-            if line.startswith('| Teammates'):
-                section = 'teammates'
-                continue
-            elif line.startswith('| Checks and Counters'):
-                section = 'checks'
-                continue
-            elif line.startswith('+') or not line.startswith('|'):
-                section = None
-                continue
-
-            if section == 'teammates' and '%' in line:
-                match = re.match(r'\|\s*(.*?)\s+([\d.]+)%\s*\|', line)
-                if match:
-                    teammate, usage = match.groups()
-                    teammates_data.append({
-                        "Pokemon": current_pokemon,
-                        "Teammate": teammate.strip(),
-                        "Usage %": float(usage)
-                    })
-
-            elif section == 'checks':
-                match = re.match(r'\|\s*(.*?)\s+([\d.]+)\s+\((.*?)\)\s*\|', line)
-                if match:
-                    check, usage, performance = match.groups()
-                    checks_data.append({
-                        "Pokemon": current_pokemon,
-                        "Check": check.strip(),
-                        "Usage %": float(usage),
-                        "Performance": performance.strip()
-                    })
-
-    return pd.DataFrame(teammates_data), pd.DataFrame(checks_data)
-
-# Set start and end months
-start = datetime.strptime("2022-10", "%Y-%m")
-end = (datetime.today().replace(day=1) - relativedelta(months=1))
-months_available = []
-current = end
-while current >= start:
-    months_available.append(current.strftime("%Y-%m"))
-    current -= relativedelta(months=1)
+    # Parses the downloaded body line by line instead of splitting it into per-Pokemon blocks first. The body
+    # and the finished tables are still held whole, parsing only adds the rows of the current chunk.
+    return parse_moveset(iter_text_lines(text))
+
+def extract_moveset_sections(text):
+    # Every section of the moveset file (abilities, items, spreads, moves, tera types, teammates, checks)
+    return parse_moveset_sections(iter_text_lines(text))
+
+def parse_moveset_file(month, tier, rating, text):
+    # Runs in a parser process when --workers > 1: every non-empty section, tagged with where it came from
+    tables = {}
+    for section, df in extract_moveset_sections(text).items():
+        if not df.empty:
+            df["Month"] = month
+            df["Tier"] = tier
+            df["Rating"] = '1000' if rating == '0' else rating
+            tables[section] = df
+    return tables
+
+MANIFEST_PATH = "moveset_manifest.json"
+# Shared with rotomScraper.py, raw moveset files are kept so the parser can be re-run offline
+CACHE_DIR = "raw_cache"
 
 tier_list = ["gen9ubers", "gen9ou", "gen9uu", "gen9ru", "gen9nu", "gen9pu", "gen9zu",
              "gen8ou", "gen7ou", "gen6ou", "gen5ou", "gen4ou", "gen3ou", "gen2ou", "gen1ou"]
 ladder_ranking = ["0", "1500", "1630", "1695", "1760", "1825"]
 url_template = 'https://www.smogon.com/stats/{}/moveset/{}-{}.txt'
 
-all_teammates = []
-all_checks = []
 
-for month in months_available:
-    for tier in tier_list:
-        for rating in ladder_ranking:
-            url = url_template.format(month, tier, rating)
+def get_months_available():
+    # Set start and end months
+    start = datetime.strptime("2022-10", "%Y-%m")
+    end = (datetime.today().replace(day=1) - relativedelta(months=1))
+    months_available = []
+    current = end
+    while current >= start:
+        months_available.append(current.strftime("%Y-%m"))
+        current -= relativedelta(months=1)
+    return months_available
+
+
+def iter_parsed_files(fetcher, jobs, workers=1):
+    # Yields (url, tables, error) in the same order as jobs, tables being None for a file that couldn't be
+    # fetched. The fetcher keeps downloading at its own rate while up to `workers` processes parse what has
+    # already arrived, and the caller stays the only one writing results.
+    downloads = fetcher.fetch_all(jobs)
+    if workers <= 1:
+        for url, text in downloads:
             try:
-                response = requests.get(url)
-                if response.status_code != 200:
-                    print(f"Failed to fetch {url}")
-                    continue
-                text = response.text
-
-                df_teammates, df_checks = extract_teammates_and_checks(text)
-                if not df_teammates.empty:
-                    df_teammates["Month"] = month
-                    df_teammates["Tier"] = tier
-                    df_teammates["Rating"] = rating
-                    all_teammates.append(df_teammates)
-
-                if not df_checks.empty:
-                    df_checks["Month"] = month
-                    df_checks["Tier"] = tier
-                    df_checks["Rating"] = rating
-                    all_checks.append(df_checks)
-
-                print(f"Processed: {month}, {tier}, rating {rating}")
-                time.sleep(1)  # Be polite to the server
+                yield url, None if text is None else parse_moveset_file(*jobs[url], text), None
             except Exception as e:
-                print(f"Error processing {url}: {e}")
-                continue
-
-for df in all_teammates:
-    df['Rating'] = df['Rating'].replace('0', '1000')
-for df in all_checks:
-    df['Rating'] = df['Rating'].replace('0', '1000')
-
-# Combine all results into final DataFrames
-final_teammates = pd.concat(all_teammates, ignore_index=True)
-final_checks = pd.concat(all_checks, ignore_index=True)
-
-# Save to CSV
-final_teammates.to_csv("smogon_teammates_data.csv", index=False)
-final_checks.to_csv("smogon_checks_data.csv", index=False)
-
-print("Data saved to CSV.")
\ No newline at end of file
+                yield url, None, e
+        return
+
+    def result(url, future):
+        try:
+            return url, None if future is None else future.result(), None
+        except Exception as e:
+            return url, None, e
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for url, text in downloads:
+            pending.append((url, None if text is None else pool.submit(parse_moveset_file, *jobs[url], text)))
+            # Hand back whatever is finished at the front, and don't let more than a few files queue up
+            while pending and (pending[0][1] is None or pending[0][1].done() or len(pending) > 2 * workers):
+                yield result(*pending.popleft())
+        while pending:
+            yield result(*pending.popleft())
+
+
+def load_existing_tables():
+    # {section: DataFrame with names}, from the moveset store if there is one, else the teammates/checks CSVs
+    names = load_moveset_names()
+    tables = {}
+    for section in SECTION_COLUMNS:
+        encoded = load_moveset_section(section)
+        if encoded is not None:
+            df = decode_moveset_table(encoded, section, names)
+            # Same Month/Tier/Rating strings as freshly parsed rows
+            df['Month'] = df['Month'].dt.strftime('%Y-%m')
+            df['Tier'] = df['Tier'].astype(str)
+            df['Rating'] = df['Rating'].astype(str)
+            tables[section] = df[SECTION_COLUMNS[section] + ['Month', 'Tier', 'Rating']]
+    if not tables and os.path.exists(TEAMMATES_PATH) and os.path.exists(CHECKS_PATH):
+        tables['teammates'] = pd.read_csv(TEAMMATES_PATH, dtype={'Month': str, 'Rating': str})
+        tables['checks'] = pd.read_csv(CHECKS_PATH, dtype={'Month': str, 'Rating': str})
+    return tables, names
+
+
+def main(incremental=False, offline=False, workers=1):
+    triples = [(month, tier, rating) for month in get_months_available()
+               for tier in tier_list for rating in ladder_ranking]
+    latest_month = triples[0][0]
+
+    manifest = ScrapeManifest(MANIFEST_PATH)
+    all_tables = {section: [] for section in SECTION_COLUMNS}
+    names = None
+    if incremental:
+        existing_tables, names = load_existing_tables()
+        if 'teammates' in existing_tables:
+            # First incremental run after a full scrape: seed the manifest from what's already been saved
+            if not len(manifest):
+                existing_triples = existing_tables['teammates'][['Month', 'Tier', 'Rating']].drop_duplicates()
+                for month, tier, rating in existing_triples.itertuples(index=False):
+                    manifest.mark_ingested(month, tier, '0' if rating == '1000' else rating)
+            triples = manifest.missing(triples)
+            print(f"Incremental mode: {len(triples)} files to fetch")
+            if not triples:
+                print("Data already up to date!")
+                return
+            for section, df in existing_tables.items():
+                all_tables[section].append(df)
+
+    # One request at a time, once a second, to be polite to the server
+    fetcher = Fetcher(max_workers=1, rate=1, cache=ResponseCache(CACHE_DIR), offline=offline)
+    jobs = {url_template.format(month, tier, rating): (month, tier, rating) for month, tier, rating in triples}
+    for url, tables, error in iter_parsed_files(fetcher, jobs, workers):
+        month, tier, rating = jobs[url]
+        if error is not None:
+            print(f"Error processing {url}: {error}")
+            continue
+        if tables is None:
+            print(f"Failed to fetch {url}")
+            # Last month may just not be published yet, anything older is never coming
+            if url in fetcher.not_found and month != latest_month:
+                manifest.mark_unavailable(month, tier, rating)
+            continue
+
+        for section, df in tables.items():
+            all_tables[section].append(df)
+        manifest.mark_ingested(month, tier, rating)
+        print(f"Processed: {month}, {tier}, rating {rating}")
+    fetcher.close()
+
+    # Combine all results into final DataFrames, newly scraped rows go after the existing ones
+    final_tables = {section: pd.concat(frames, ignore_index=True) if frames
+                    else pd.DataFrame(columns=SECTION_COLUMNS[section] + ['Month', 'Tier', 'Rating'])
+                    for section, frames in all_tables.items()}
+
+    # Save to CSV
+    final_teammates = final_tables['teammates']
+    final_checks = final_tables['checks']
+    final_teammates.to_csv(TEAMMATES_PATH, index=False)
+    final_checks.to_csv(CHECKS_PATH, index=False)
+
+    # Every section, dictionary-encoded, for the app
+    names = names or load_moveset_names()
+    write_moveset_store({section: encode_moveset_table(df, section, names) for section, df in final_tables.items()},
+                        names)
+    manifest.save()
+
+    print(f"Data saved to CSV and {MOVESET_STORE_PATH}/ ({len(names)} names).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape teammates and checks from Smogon moveset files")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only fetch (month, tier, rating) files that aren't already in the CSVs")
+    parser.add_argument('--offline', action='store_true',
+                        help=f"Replay responses from {CACHE_DIR}/ instead of going to the network")
+    parser.add_argument('--workers', type=int, default=1,
+                        help=f"Parser processes running next to the downloader (this machine has {os.cpu_count()} cores)")
+    args = parser.parse_args()
+    main(incremental=args.incremental, offline=args.offline, workers=args.workers)
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying, anything else (e.g. 404 for a tier/rating Smogon didn't publish) is final
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    # Hands out evenly spaced time slots per host so all workers together stay under `rate` requests/second
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def decode_body(body):
+    # Smogon serves text/plain without a charset, so don't let requests fall back to latin-1
+    return body.decode('utf-8', errors='replace')
+
+
+class Fetcher:
+    # Downloads many text files over a shared connection pool with a bounded number of worker threads.
+    # With a ResponseCache, bodies are stored locally and revalidated with conditional requests, and
+    # offline=True replays everything from the cache without touching the network.
+    def __init__(self, max_workers=8, rate=5.0, retries=3, backoff=0.5, timeout=30, cache=None, offline=False):
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+        self.cache = cache
+        self.offline = offline
+        # URLs the server answered with 404, as opposed to ones that failed or weren't cached
+        self.not_found = set()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch(self, url):
+        # Returns the decoded body, or None if the file doesn't exist or every attempt failed
+        body = self.fetch_bytes(url)
+        return decode_body(body) if body is not None else None
+
+    def fetch_bytes(self, url):
+        # Same as fetch without decoding, for binary files like sprites
+        if self.offline:
+            return self.cache.get(url) if self.cache is not None else None
+
+        host = urlparse(url).netloc
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            self.limiter.wait(host)
+            headers = self.cache.validators(url) if self.cache is not None else {}
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = e
+                continue
+
+            if response.status_code == 304 and self.cache is not None:
+                body = self.cache.get(url)
+                if body is not None:
+                    return body
+                # Evicted since we sent the validators, next attempt goes out unconditionally
+                error = "cached copy evicted"
+                continue
+            if response.status_code == 200:
+                if self.cache is not None:
+                    self.cache.put(url, response.content, etag=response.headers.get('ETag'),
+                                   last_modified=response.headers.get('Last-Modified'))
+                return response.content
+            if response.status_code == 404:
+                self.not_found.add(url)
+            if response.status_code not in RETRY_STATUS:
+                return None
+            error = f"HTTP {response.status_code}"
+
+        print(f"Failed to fetch {url} after {self.retries + 1} attempts: {error}")
+        return None
+
+    def fetch_all(self, urls, decode=True, window=None):
+        # Yields (url, text) pairs in the same order as `urls` while downloads run concurrently,
+        # (url, bytes) with decode=False. Downloads are only started `window` URLs (twice the workers by default)
+        # ahead of the one being handed back, so bodies don't pile up in memory when the caller is slower.
+        fetch = self.fetch if decode else self.fetch_bytes
+        window = window or 2 * self.max_workers
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = deque()
+            try:
+                for url in urls:
+                    pending.append((url, pool.submit(fetch, url)))
+                    if len(pending) >= window:
+                        url, future = pending.popleft()
+                        yield url, future.result()
+                while pending:
+                    url, future = pending.popleft()
+                    yield url, future.result()
+            finally:
+                # The caller stopped early, don't start what it won't read
+                for _, future in pending:
+                    future.cancel()
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.save()
@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+
+
+class FigureCache:
+    # LRU cache of figures serialized to JSON, bounded by the total size of the stored strings.
+    # Keys should include the dataset version; a version change drops everything built from the old data.
+    def __init__(self, max_bytes=32 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def set_version(self, version):
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.total_bytes = 0
+                self.version = version
+
+    def get(self, key):
+        with self.lock:
+            figure_json = self.entries.get(key)
+            if figure_json is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return figure_json
+
+    def put(self, key, figure_json):
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= len(self.entries.pop(key))
+            # A figure bigger than the whole cache just isn't stored
+            if len(figure_json) <= self.max_bytes:
+                self.entries[key] = figure_json
+                self.total_bytes += len(figure_json)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+        return figure_json
+
+    def get_or_build(self, key, build):
+        # build() returns a plotly figure and is only called on a miss
+        figure_json = self.get(key)
+        if figure_json is None:
+            figure_json = self.put(key, build().to_json())
+        return figure_json
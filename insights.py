@@ -0,0 +1,65 @@
+from collections import Counter
+
+import pandas as pd
+
+# Smogon's usage cutoff for a Pokemon to count as part of a tier's metagame
+USAGE_CUTOFF = 3.406
+
+# Types that didn't exist yet in older generations, so they can't be the "least common" one there
+EXCLUDED_TYPES = {
+    'gen1ou': ['dark', 'steel', 'fairy'],
+    'gen2ou': ['fairy'],
+    'gen3ou': ['fairy'],
+    'gen4ou': ['fairy'],
+    'gen5ou': ['fairy'],
+}
+
+INSIGHT_KEYS = ['Tier', 'Ranking', 'Month']
+
+
+def least_common_excluding(types, excluded_types):
+    type_counts = Counter(types)
+    for type_, count in type_counts.most_common()[::-1]:
+        if type_ not in excluded_types:
+            return type_
+    return "Unknown"
+
+
+def compute_insights(df, cutoff=USAGE_CUTOFF):
+    # One row of "Interesting Insights" per (Tier, Ranking, Month), built at scrape time so the app only looks them up
+    cutoff_df = df[df['Usage Rate'] >= cutoff]
+
+    combined_cutoff_df = pd.concat([cutoff_df[INSIGHT_KEYS + ['Type1']].rename(columns={'Type1': 'Type'}),
+                                    cutoff_df[INSIGHT_KEYS + ['Type2']].rename(columns={'Type2': 'Type'})])
+    #Remove all null boxes and boxes with "---"
+    combined_cutoff_df = combined_cutoff_df.loc[
+        combined_cutoff_df['Type'].notna() & (combined_cutoff_df['Type'] != '') & (combined_cutoff_df['Type'] != '---')]
+    types_by_key = {key: group['Type'].tolist()
+                    for key, group in combined_cutoff_df.groupby(INSIGHT_KEYS, observed=True, sort=False)}
+
+    rows = []
+    for (tier, ranking, month), group in cutoff_df.groupby(INSIGHT_KEYS, observed=True):
+        types = types_by_key.get((tier, ranking, month), [])
+        # Pokemon without stats have no BST and are left out of the BST insights, which are left empty (shown
+        # as "Unknown") when none of them has one. Empty rather than "Unknown" so the columns stay one type.
+        bst = group['BST'].dropna()
+        rows.append({
+            'Tier': tier,
+            'Ranking': ranking,
+            'Month': month,
+            'Most Common Type': Counter(types).most_common(1)[0][0] if types else "Unknown",
+            'Least Common Type': least_common_excluding(types, EXCLUDED_TYPES.get(tier, [])),
+            'Highest BST': group.loc[bst.idxmax(), 'Name'] if len(bst) else None,
+            'Lowest BST': group.loc[bst.idxmin(), 'Name'] if len(bst) else None,
+            'Average BST': bst.mean().round() if len(bst) else float('nan'),
+        })
+    return pd.DataFrame(rows, columns=INSIGHT_KEYS + ['Most Common Type', 'Least Common Type', 'Highest BST',
+                                                     'Lowest BST', 'Average BST'])
+
+
+def index_insights(insights):
+    # {(tier, ranking, month): {column: value}} for constant time lookups from the callbacks. Empty values are
+    # left out so the callbacks' defaults apply.
+    insights = insights.astype({'Tier': str, 'Ranking': int})
+    return {key: {column: value for column, value in entry.items() if pd.notna(value)}
+            for key, entry in insights.set_index(INSIGHT_KEYS).to_dict('index').items()}
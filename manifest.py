@@ -0,0 +1,42 @@
+import json
+import os
+
+
+class ScrapeManifest:
+    # Remembers which (month, tier, rating) files a scraper has already ingested so incremental runs can skip them.
+    # Past months' Smogon stats never change, so once a triple is in here it never needs to be downloaded again.
+    def __init__(self, path):
+        self.path = path
+        self.ingested = set()
+        self.unavailable = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.ingested = {tuple(entry) for entry in data.get('ingested', [])}
+            self.unavailable = {tuple(entry) for entry in data.get('unavailable', [])}
+
+    def __len__(self):
+        return len(self.ingested)
+
+    def is_done(self, month, tier, rating):
+        key = (month, tier, str(rating))
+        return key in self.ingested or key in self.unavailable
+
+    def missing(self, triples):
+        return [triple for triple in triples if not self.is_done(*triple)]
+
+    def mark_ingested(self, month, tier, rating):
+        key = (month, tier, str(rating))
+        self.ingested.add(key)
+        self.unavailable.discard(key)
+
+    def mark_unavailable(self, month, tier, rating):
+        # For files Smogon never published (e.g. gen9ou-1760), so we don't keep asking for them every run
+        self.unavailable.add((month, tier, str(rating)))
+
+    def save(self):
+        data = {'ingested': sorted(self.ingested), 'unavailable': sorted(self.unavailable)}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,55 @@
+import pandas as pd
+
+MOVER_KEYS = ['Tier', 'Ranking', 'Month']
+# Trend is the average monthly Usage Change over this many months, the row's own included
+TREND_MONTHS = 3
+
+
+def compute_movers(df):
+    # One row per (Tier, Ranking, Name, Month) comparing the Pokemon with the month before, built at scrape time
+    # so the meta summary only looks rows up. A Pokemon missing from a month it was in the month before (banned
+    # or unused) gets a row there with 0 usage and Status 'exited', one that wasn't in the month before is
+    # 'entered'. The first scraped month of a tier and ranking has nothing to compare with and no changes.
+    usage = df[['Tier', 'Ranking', 'Name', 'Month', 'Rank', 'Usage Rate']].astype({
+        'Tier': str, 'Name': str, 'Ranking': 'int16', 'Rank': 'float64', 'Usage Rate': 'float64'})
+    # Every row again, labelled with the month it's the previous month of
+    previous = usage.assign(Month=usage['Month'] + pd.DateOffset(months=1))
+    previous = previous.rename(columns={'Rank': 'Previous Rank', 'Usage Rate': 'Previous Usage'})
+    movers = usage.merge(previous, on=['Tier', 'Ranking', 'Name', 'Month'], how='outer', indicator=True)
+
+    # Only months that were scraped, and whether the month before them was
+    scraped = usage[MOVER_KEYS].drop_duplicates()
+    movers = movers.merge(scraped, on=MOVER_KEYS)
+    previous_scraped = scraped.assign(Month=scraped['Month'] + pd.DateOffset(months=1))
+    has_previous = movers[MOVER_KEYS].merge(previous_scraped, on=MOVER_KEYS, how='left', indicator=True)['_merge']
+    has_previous = (has_previous == 'both').to_numpy()
+
+    movers['Status'] = ''
+    movers.loc[(movers['_merge'] == 'left_only').to_numpy() & has_previous, 'Status'] = 'entered'
+    movers.loc[movers['_merge'] == 'right_only', 'Status'] = 'exited'
+    movers['Usage Rate'] = movers['Usage Rate'].fillna(0)
+    movers['Previous Usage'] = movers['Previous Usage'].fillna(0).where(has_previous)
+    movers['Usage Change'] = movers['Usage Rate'] - movers['Previous Usage']
+    # Positive when the Pokemon climbed
+    movers['Rank Change'] = movers['Previous Rank'] - movers['Rank']
+
+    # Month starts within 80 days of a row are its own and the two before it, whatever the month lengths. Months
+    # without a row for the Pokemon didn't change its usage, so the sum is divided by the full number of months.
+    movers = movers.sort_values(['Tier', 'Ranking', 'Name', 'Month'], ignore_index=True)
+    trend = movers.groupby(['Tier', 'Ranking', 'Name'], sort=False).rolling(
+        f'{TREND_MONTHS * 30 - 10}D', on='Month', min_periods=1)['Usage Change'].sum()
+    movers['Trend'] = trend.to_numpy() / TREND_MONTHS
+
+    movers = movers.sort_values(['Tier', 'Ranking', 'Month', 'Usage Rate'], ascending=[True, True, True, False],
+                                ignore_index=True)
+    return movers[['Tier', 'Ranking', 'Month', 'Name', 'Status', 'Usage Rate', 'Previous Usage', 'Usage Change',
+                   'Rank', 'Previous Rank', 'Rank Change', 'Trend']].astype({
+        'Tier': 'category', 'Name': 'category', 'Status': 'category', 'Rank': 'Int16', 'Previous Rank': 'Int16',
+        'Rank Change': 'Int16', 'Usage Rate': 'float32', 'Previous Usage': 'float32', 'Usage Change': 'float32',
+        'Trend': 'float32'})
+
+
+def index_movers(movers):
+    # {(tier, ranking, month): that month's rows, most used first} for constant time lookups from the callbacks
+    return {(str(tier), int(ranking), pd.Timestamp(month)): group.reset_index(drop=True)
+            for (tier, ranking, month), group in movers.groupby(MOVER_KEYS, observed=True, sort=False)}
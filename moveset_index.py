@@ -0,0 +1,106 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from data_store import MOVESET_STORE_PATH, load_moveset_names, load_moveset_section
+from moveset_parser import SECTION_COLUMNS
+
+
+class MovesetIndex:
+    # Serves the moveset tables written by extract_teammates_and_checks.py. A tier is read from disk the first
+    # time it's asked for and split by (Rating, Month, Pokemon ID), so a lookup is a dict access plus a slice
+    # of rows already sorted from most to least used. Only the max_tiers most recently used tiers are kept.
+    # The IDs in a tier only mean something with the names of the same store, so when the scraper swaps in a new
+    # store the names are read again and the tiers loaded from the old one are dropped.
+    def __init__(self, path=MOVESET_STORE_PATH, max_tiers=4):
+        self.path = path
+        self.max_tiers = max_tiers
+        self.lock = threading.Lock()
+        self.version = None
+        self.names = None
+        self.refresh()
+
+    def store_version(self):
+        # names.parquet is rewritten with every store, None until there is one
+        try:
+            return os.stat(os.path.join(self.path, 'names.parquet')).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        version = self.store_version()
+        if version == self.version and self.names is not None:
+            return
+        names = load_moveset_names(self.path)
+        # Names in the usage data and in the moveset files don't always agree on case
+        lower_ids = {name.lower(): i for i, name in enumerate(names.names)}
+        with self.lock:
+            self.names, self.lower_ids, self.version = names, lower_ids, version
+            self.tiers = OrderedDict()
+
+    def resolve(self, name):
+        # Pokemon ID for a name, or None if it never appeared in a moveset file
+        pokemon_id = self.names.lookup(name)
+        if pokemon_id is None:
+            pokemon_id = self.lower_ids.get(str(name).strip().lower())
+        return pokemon_id
+
+    def load_tier(self, tier):
+        self.refresh()
+        with self.lock:
+            if tier in self.tiers:
+                self.tiers.move_to_end(tier)
+                return self.tiers[tier]
+            version = self.version
+
+        sections = {}
+        for section in SECTION_COLUMNS:
+            df = load_moveset_section(section, tier, self.path)
+            if df is None or df.empty:
+                continue
+            df = df.sort_values(['Rating', 'Month', 'Pokemon ID', 'Usage %'],
+                                ascending=[True, True, True, False], ignore_index=True)
+            keys = [df[col].to_numpy() for col in ['Rating', 'Month', 'Pokemon ID']]
+            changed = np.zeros(len(df) - 1, dtype=bool)
+            for key in keys:
+                changed |= key[1:] != key[:-1]
+            starts = np.flatnonzero(np.r_[True, changed])
+            stops = np.r_[starts[1:], len(df)]
+            bounds = {(int(keys[0][start]), pd.Timestamp(keys[1][start]), int(keys[2][start])): (start, stop)
+                      for start, stop in zip(starts, stops)}
+            sections[section] = (df, bounds)
+
+        with self.lock:
+            # Not kept if a newer store was picked up meanwhile
+            if self.version == version:
+                self.tiers[tier] = sections
+                while len(self.tiers) > self.max_tiers:
+                    self.tiers.popitem(last=False)
+        return sections
+
+    def lookup(self, section, pokemon, tier, rating, month, n=None):
+        # The section's rows for one Pokemon, with names instead of IDs, most used first. None if there are none.
+        table = self.load_tier(tier).get(section)
+        names = self.names
+        pokemon_id = self.resolve(pokemon)
+        if pokemon_id is None or table is None:
+            return None
+        df, bounds = table
+        span = bounds.get((int(rating), pd.Timestamp(month).to_period('M').to_timestamp(), pokemon_id))
+        if span is None:
+            return None
+        value_column = SECTION_COLUMNS[section][1]
+        rows = df.iloc[span[0]:span[1]] if n is None else df.iloc[span[0]:min(span[1], span[0] + n)]
+        try:
+            values = names.decode(rows[f'{value_column} ID'])
+        except IndexError:
+            # The store was swapped between reading the tier and its names, the next lookup reads both again
+            self.version = None
+            return None
+        result = pd.DataFrame({value_column: values, 'Usage %': rows['Usage %'].to_numpy()})
+        if section == 'checks':
+            result['Performance'] = rows['Performance'].to_numpy()
+        return result
@@ -0,0 +1,129 @@
+import re
+
+import pandas as pd
+
+# Line patterns of https://www.smogon.com/stats/<month>/moveset/<tier>-<rating>.txt, compiled once
+BORDER_RE = re.compile(r'\+-+\+')
+BOX_RE = re.compile(r'\|\s*(.*?)\s*\|')
+PERCENT_RE = re.compile(r'\|\s*(.*?)\s+([\d.]+)%\s*\|')
+CHECK_RE = re.compile(r'\|\s*(.*?)\s+([\d.]+)\s+\((.*?)\)\s*\|')
+
+# Box titles of the sections listed as "<name> <usage>%" lines
+PERCENT_SECTIONS = {
+    'Abilities': 'abilities',
+    'Items': 'items',
+    'Spreads': 'spreads',
+    'Moves': 'moves',
+    'Tera Types': 'tera_types',
+}
+
+SECTION_COLUMNS = {
+    'abilities': ["Pokemon", "Ability", "Usage %"],
+    'items': ["Pokemon", "Item", "Usage %"],
+    'spreads': ["Pokemon", "Spread", "Usage %"],
+    'moves': ["Pokemon", "Move", "Usage %"],
+    'tera_types': ["Pokemon", "Tera Type", "Usage %"],
+    'teammates': ["Pokemon", "Teammate", "Usage %"],
+    'checks': ["Pokemon", "Check", "Usage %", "Performance"],
+}
+TEAMMATE_COLUMNS = SECTION_COLUMNS['teammates']
+CHECK_COLUMNS = SECTION_COLUMNS['checks']
+
+
+def iter_text_lines(text, block_size=64 * 1024):
+    # The lines of a body already in memory, split a block of about block_size characters at a time.
+    # io.StringIO(text) would first copy the whole body into a buffer several times its size, and
+    # text.split('\n') makes every line at once.
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start + block_size)
+        if end < 0:
+            # A trailing newline doesn't start another line
+            end = len(text) - 1 if text.endswith('\n') else len(text)
+        yield from text[start:end].split('\n')
+        start = end + 1
+
+
+def iter_moveset_rows(lines, sections=None):
+    # Walks a moveset file one line at a time and yields (section, row) tuples, section being one of
+    # SECTION_COLUMNS (only the given ones if sections is set, rows of the others aren't matched at all). Each
+    # Pokemon starts with its name boxed in between two border lines, which we only know once we see the
+    # closing border, so the last two lines are kept around to spot it.
+    wanted = set(sections or SECTION_COLUMNS)
+    current_pokemon = None
+    section = None
+    previous = ''
+    previous_border = before_previous_border = False
+    # A border that closed a name box can't also open the next one
+    closing_border = None
+
+    for index, line in enumerate(lines):
+        line = line.strip()
+        is_border = line.startswith('+') and BORDER_RE.fullmatch(line) is not None
+
+        if is_border and before_previous_border and closing_border != index - 2:
+            name = BOX_RE.fullmatch(previous)
+            if name:
+                current_pokemon = name.group(1)
+                closing_border = index
+
+        if line.startswith('| Teammates'):
+            section = 'teammates'
+        elif line.startswith('| Checks and Counters'):
+            section = 'checks'
+        elif line.startswith('+') or not line.startswith('|'):
+            section = None
+        elif previous_border and '%' not in line and (title := BOX_RE.fullmatch(line)) and \
+                title.group(1) in PERCENT_SECTIONS:
+            section = PERCENT_SECTIONS[title.group(1)]
+        elif current_pokemon is None or section not in wanted:
+            pass
+        elif section == 'checks':
+            match = CHECK_RE.match(line)
+            if match:
+                check, usage, performance = match.groups()
+                yield 'checks', (current_pokemon, check.strip(), float(usage), performance.strip())
+        elif '%' in line:
+            match = PERCENT_RE.match(line)
+            if match:
+                value, usage = match.groups()
+                yield section, (current_pokemon, value.strip(), float(usage))
+
+        before_previous_border, previous_border, previous = previous_border, is_border, line
+
+
+def parse_moveset_chunks(lines, chunk_rows=100000, sections=None):
+    # Yields (section, DataFrame) chunks of at most chunk_rows rows, so a caller can write them out as they come
+    # instead of holding every row. Memory only stays flat if lines is streamed too (an open file, or
+    # iter_text_lines over a body) and the chunks aren't collected. Only the given sections are kept (all of them
+    # by default).
+    sections = sections or list(SECTION_COLUMNS)
+    columns = {section: [[] for _ in SECTION_COLUMNS[section]] for section in sections}
+
+    for section, row in iter_moveset_rows(lines, sections):
+        arrays = columns[section]
+        for array, value in zip(arrays, row):
+            array.append(value)
+        if len(arrays[0]) >= chunk_rows:
+            yield section, pd.DataFrame(dict(zip(SECTION_COLUMNS[section], arrays)))
+            columns[section] = [[] for _ in arrays]
+
+    for section, arrays in columns.items():
+        if arrays[0]:
+            yield section, pd.DataFrame(dict(zip(SECTION_COLUMNS[section], arrays)))
+
+
+def parse_moveset_sections(lines, sections=None):
+    # Whole-file version: returns {section: DataFrame}, with an empty frame for sections the file doesn't have
+    sections = sections or list(SECTION_COLUMNS)
+    chunks = {section: [] for section in sections}
+    for section, chunk in parse_moveset_chunks(lines, sections=sections):
+        chunks[section].append(chunk)
+    return {section: pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SECTION_COLUMNS[section])
+            for section, frames in chunks.items()}
+
+
+def parse_moveset(lines):
+    # Returns (teammates, checks) DataFrames
+    tables = parse_moveset_sections(lines, sections=['teammates', 'checks'])
+    return tables['teammates'], tables['checks']
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+
+class ResponseCache:
+    # Local store of raw Smogon responses so the parsers can be re-run without going back to the network.
+    # Bodies are saved once per sha256 of their content under blobs/, and index.json maps each URL to its
+    # blob plus the ETag/Last-Modified validators needed to revalidate it. The least recently used URLs are
+    # evicted once the blobs take up more than max_bytes.
+    def __init__(self, root, max_bytes=2 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.index_path = os.path.join(root, 'index.json')
+        self.lock = threading.RLock()
+        self.dirty = 0
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+        self.entries = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        # Several URLs can point at the same blob, so track references and count each blob's size once
+        self.refs = Counter(entry['hash'] for entry in self.entries.values())
+        self.total_bytes = sum({entry['hash']: entry['size'] for entry in self.entries.values()}.values())
+
+    def __contains__(self, url):
+        return url in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def get(self, url):
+        # Returns the cached body as bytes, or None on a miss
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            try:
+                with open(self.blob_path(entry['hash']), 'rb') as f:
+                    body = f.read()
+            except FileNotFoundError:
+                # Blob was removed behind our back, forget the entry so it gets fetched again
+                self.remove(url)
+                return None
+            entry['accessed'] = time.time()
+            self.dirty += 1
+            return body
+
+    def validators(self, url):
+        # Conditional request headers for revalidating a cached URL with the server
+        entry = self.entries.get(url)
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url, body, etag=None, last_modified=None):
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.blob_path(digest)
+        with self.lock:
+            if self.refs[digest] == 0 and not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+
+            if url in self.entries:
+                self.remove(url)
+            if self.refs[digest] == 0:
+                self.total_bytes += len(body)
+            self.refs[digest] += 1
+            self.entries[url] = {'hash': digest, 'size': len(body), 'etag': etag,
+                                 'last_modified': last_modified, 'accessed': time.time()}
+            self.dirty += 1
+            self.evict()
+            if self.dirty >= 100:
+                self.save()
+
+    def remove(self, url):
+        with self.lock:
+            entry = self.entries.pop(url, None)
+            if entry is None:
+                return
+            self.refs[entry['hash']] -= 1
+            if self.refs[entry['hash']] <= 0:
+                del self.refs[entry['hash']]
+                self.total_bytes -= entry['size']
+                try:
+                    os.remove(self.blob_path(entry['hash']))
+                except FileNotFoundError:
+                    pass
+            self.dirty += 1
+
+    def evict(self):
+        with self.lock:
+            if self.total_bytes <= self.max_bytes:
+                return
+            for url in sorted(self.entries, key=lambda u: self.entries[u]['accessed']):
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.remove(url)
+
+    def save(self):
+        with self.lock:
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = 0
@@ -1,143 +1,220 @@
-import requests
+import argparse
+import os
 from bs4 import BeautifulSoup
 import pandas as pd
-import dash
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
-print("Running...")
+from data_store import (EXCEL_PATH, SPECIES_COLUMNS, STAT_COLUMNS, USAGE_STORE_PATH, load_usage_tables,
+                        prepare_usage_dtypes, species_dtypes, widen_usage, write_insights, write_movers,
+                        write_shared_dataset, write_usage_store)
+from fetcher import Fetcher
+from insights import compute_insights
+from manifest import ScrapeManifest
+from movers import compute_movers
+from response_cache import ResponseCache
+from species_resolver import SpeciesResolver
+from sprite_cache import SpriteCache
+from usage_parser import parse_usage_text
 
 pd.set_option('display.max_colwidth', None)
+# Set the max amount of column
+pd.set_option('display.max_columns', 7)
+
 # Define the URL of the page to scrape
 sprite_url = 'https://pokemondb.net/sprites'
-response = requests.get(sprite_url)
-soup = BeautifulSoup(response.content, 'html.parser')
-
-# Find all infocard elements
-pokemon_cards = soup.select('a.infocard')
-sprite_list = []
-
-# Loop through each infocard element to extract the data
-for card in pokemon_cards:
-    name = card.text.strip()  # Extract the Pokémon name
-
-    # Find the image source within the picture tag
-    img_tag = card.find('img')
-    img_url = img_tag['src'] if img_tag else None
-
-    # Append the data to the list
-    sprite_list.append({'Name': name, 'Image URL': img_url})
-
-sprite_links = pd.DataFrame(sprite_list)
-# Get pokemon stats from "list_of_pokemon_df.csv"
-pokemon_stats = pd.read_csv("list_of_pokemon_df.csv")
-
-# Set start and end months
-start = datetime.strptime("2022-10", "%Y-%m")
-# Use last month as the endpoint
-end = (datetime.today().replace(day=1) - relativedelta(months=1))
-months_avaliable = []
-current = end
-while current >= start:
-    months_avaliable.append(current.strftime("%Y-%m"))
-    current -= relativedelta(months=1)
+url = 'https://www.smogon.com/stats/{}/{}-{}.txt'
 
 tier_list = ["gen9ubers", "gen9ou", "gen9uu", "gen9ru", "gen9nu", "gen9pu", "gen9zu", "gen8ou", "gen7ou", "gen6ou", "gen5ou", "gen4ou", "gen3ou", "gen2ou", "gen1ou"]
 ladder_ranking = ["0", "1500", "1630", "1760", "1825"] #1825 is the highest measured ranking threshold for OU, while 1760 is the highest threshold for other tiers
 
-# List to hold the dataframes
-list_df = []
-
-app = dash.Dash(__name__)
-
-url = 'https://www.smogon.com/stats/{}/{}-{}.txt'
-
-# Set the max amount of column
-pd.set_option('display.max_columns', 7)
-
-# Read the csv with each loop iteration until you get the full list
-for months in months_avaliable:
-    for tier in tier_list:
-        for ranking in ladder_ranking:
-            try:
-                # Keep going through each tier/generation in successive for loop
-                full_link = url.format(months, tier, ranking)
-
-                # Read the link every iteration
-                new_df = pd.read_csv(full_link)
-
-                # Manipulate Data until you get seperate columns
-                new_df.columns = ['All']
-                new_df = new_df.drop([0, 1, 2, 3, ])
-                split_lines = new_df['All'].str.split('|', n=7, expand=True)
-                new_df['Rank'] = split_lines[1]
-                new_df['Name'] = split_lines[2]
-                new_df['Usage Rate'] = split_lines[3]
-                new_df['Raw Usage'] = split_lines[4]
-                new_df['Raw %'] = split_lines[5]
-                new_df['Real Usage'] = split_lines[6]
-                new_df['Real %'] = split_lines[7]
-                new_df.drop(columns=["All"], inplace=True)
-                new_df.dropna(inplace=True)
-                columns_to_drop = ['Real Usage', 'Real %']
-                new_df = new_df.drop(columns=columns_to_drop)
-                new_df['Tier'] = tier
-                new_df['Month'] = months
-                new_df['Ranking'] = ranking
-
-                # Append the new DataFrame to the list
-                list_df.append(new_df)
-            except Exception as e:
-                print(f"Error processing {months} {tier} {ranking}: {e}")
-                continue  # Continue with the next tier instead of breaking the month loop
-
-# Concatenate all DataFrames in the list into one DataFrame
-df_final = pd.concat(list_df, ignore_index=True)
-
-# Normalize the 'Name' and Stats columns in each DataFrame
-sprite_links['Name'] = sprite_links['Name'].str.strip().str.title()
-df_final['Name'] = df_final['Name'].str.strip().str.title()
-pokemon_stats['Name'] = pokemon_stats['Name'].str.strip().str.title()
-pokemon_stats['HP'] = pokemon_stats['HP'].astype(str)
-pokemon_stats['HP'] = pokemon_stats['HP'].str.strip().str.title()
-
-# Recreate the mapping Series with normalized names
-name_to_image_url = sprite_links.set_index('Name')['Image URL']
-pokemon_stats_unique = pokemon_stats.drop_duplicates(subset='Name', keep='first')
-hp = pokemon_stats_unique.set_index('Name')['HP']
-attack = pokemon_stats_unique.set_index('Name')['Attack']
-defense = pokemon_stats_unique.set_index('Name')['Defense']
-sp_attack = pokemon_stats_unique.set_index('Name')['Sp.Attack']
-sp_defense = pokemon_stats_unique.set_index('Name')['Sp.Defense']
-speed = pokemon_stats_unique.set_index('Name')['Speed']
-type_one = pokemon_stats_unique.set_index('Name')['Type1']
-type_two = pokemon_stats_unique.set_index('Name')['Type2']
-
-# Map the 'Name' column in df_final to 'Sprite Links' using the created mapping Series
-df_final['Sprite Links'] = df_final['Name'].map(name_to_image_url)
-df_final['HP'] = df_final['Name'].map(hp)
-df_final['Attack'] = df_final['Name'].map(attack)
-df_final['Defense'] = df_final['Name'].map(defense)
-df_final['Sp.Attack'] = df_final['Name'].map(sp_attack)
-df_final['Sp.Defense'] = df_final['Name'].map(sp_defense)
-df_final['Speed'] = df_final['Name'].map(speed)
-df_final['Type1'] = df_final['Name'].map(type_one)
-df_final['Type2'] = df_final['Name'].map(type_two)
-
-# Get BST of each pokemon
-columns_to_sum = ['HP', 'Attack', 'Defense', "Sp.Attack", "Sp.Defense", "Speed"]
-
-# Convert columns to numeric, forcing any errors to NaN
-df_final[columns_to_sum] = df_final[columns_to_sum].apply(pd.to_numeric, errors='coerce')
-df_final['BST'] = df_final[columns_to_sum].sum(axis=1)
-
-# Convert entire 'Month' column to datetime format
-df_final['Month'] = pd.to_datetime(df_final['Month'], format='%Y-%m')
-df_final['Month'] = df_final['Month'].dt.strftime('%Y-%m')
-# Convert entire 'Usage' column to numeric
-df_final['Usage Rate'] = df_final['Usage Rate'].str.replace('%', '')
-df_final['Usage Rate'] = df_final['Usage Rate'].apply(pd.to_numeric)
-
-df_final.to_excel('sample_data.xlsx')
-print("Data successfully scraped!")
-
+# Concurrent downloads, capped per host so we stay polite to smogon.com
+MAX_WORKERS = 8
+REQUESTS_PER_SECOND = 5
+
+MANIFEST_PATH = 'usage_manifest.json'
+# Raw responses are kept here so the parser can be re-run over the whole history without re-scraping
+CACHE_DIR = 'raw_cache'
+
+
+def get_months_avaliable():
+    # Set start and end months
+    start = datetime.strptime("2022-10", "%Y-%m")
+    # Use last month as the endpoint
+    end = (datetime.today().replace(day=1) - relativedelta(months=1))
+    months_avaliable = []
+    current = end
+    while current >= start:
+        months_avaliable.append(current.strftime("%Y-%m"))
+        current -= relativedelta(months=1)
+    return months_avaliable
+
+
+def get_sprite_links(fetcher):
+    soup = BeautifulSoup(fetcher.fetch(sprite_url) or '', 'html.parser')
+
+    # Find all infocard elements
+    pokemon_cards = soup.select('a.infocard')
+    sprite_list = []
+
+    # Loop through each infocard element to extract the data
+    for card in pokemon_cards:
+        name = card.text.strip()  # Extract the Pokémon name
+
+        # Find the image source within the picture tag
+        img_tag = card.find('img')
+        img_url = img_tag['src'] if img_tag else None
+
+        # Append the data to the list
+        sprite_list.append({'Name': name, 'Image URL': img_url})
+
+    return pd.DataFrame(sprite_list, columns=['Name', 'Image URL'])
+
+
+def scrape_usage(triples, fetcher, manifest=None):
+    # List to hold the dataframes
+    list_df = []
+    latest_month = max(months for months, _, _ in triples)
+
+    # Build every (month, tier, ranking) link up front so the fetcher can download them concurrently
+    jobs = {url.format(months, tier, ranking): (months, tier, ranking) for months, tier, ranking in triples}
+
+    # Parse each file as it comes back from the fetcher
+    for full_link, text in fetcher.fetch_all(jobs):
+        months, tier, ranking = jobs[full_link]
+        if text is None:
+            print(f"No data for {months} {tier} {ranking}")
+            # Last month may just not be published yet, anything older is never coming
+            if manifest is not None and months != latest_month and full_link in fetcher.not_found:
+                manifest.mark_unavailable(months, tier, ranking)
+            continue
+        try:
+            # Typed Rank, Name, Usage Rate, Raw Usage and Raw % columns, checked against the expected header
+            new_df = parse_usage_text(text)
+            new_df['Tier'] = tier
+            new_df['Month'] = months
+            new_df['Ranking'] = ranking
+
+            # Append the new DataFrame to the list
+            list_df.append(new_df)
+            if manifest is not None:
+                manifest.mark_ingested(months, tier, ranking)
+        except Exception as e:
+            print(f"Error processing {months} {tier} {ranking}: {e}")
+            continue  # Continue with the next tier instead of breaking the month loop
+
+    if not list_df:
+        return None
+    # Concatenate all DataFrames in the list into one DataFrame
+    return pd.concat(list_df, ignore_index=True)
+
+
+def clean_usage_rows(df_final):
+    # Normalize the 'Name' column the same way as the sprite and stats sheets
+    df_final['Name'] = df_final['Name'].str.strip().str.title()
+    # parse_usage_text already returns numbers, older frames have the '%' strings
+    if not pd.api.types.is_numeric_dtype(df_final['Usage Rate']):
+        df_final['Usage Rate'] = pd.to_numeric(df_final['Usage Rate'].str.replace('%', ''))
+    return df_final
+
+
+def take_rows(column, ids):
+    # column's values at the given row positions, NaN where the position is -1
+    return column.reset_index(drop=True).reindex(ids).to_numpy()
+
+
+def build_species(names, sprite_links, pokemon_stats):
+    # One row per Pokemon in names, indexed by a Species ID that is its position in names. Each name is resolved
+    # to its row in the sprite and stats sheets once (see species_resolver.py), then every column is a take by row.
+    species = pd.DataFrame({'Name': pd.Series(names, dtype=str)})
+    sprite_ids = SpeciesResolver(sprite_links['Name']).resolve(species['Name'])
+    species['Sprite Links'] = take_rows(sprite_links['Image URL'], sprite_ids)
+    stats_resolver = SpeciesResolver(pokemon_stats['Name'])
+    stats_ids = stats_resolver.resolve(species['Name'])
+    for col in ['Type1', 'Type2'] + STAT_COLUMNS:
+        species[col] = take_rows(pokemon_stats[col], stats_ids)
+    if stats_resolver.base_form:
+        print(f"Using base species stats for {len(stats_resolver.base_form)} forms: "
+              f"{', '.join(sorted(stats_resolver.base_form))}")
+    if stats_resolver.unmapped:
+        print(f"No stats for {len(stats_resolver.unmapped)} Pokemon: {', '.join(sorted(stats_resolver.unmapped))}")
+
+    # Convert columns to numeric, forcing any errors to NaN
+    species[STAT_COLUMNS] = species[STAT_COLUMNS].apply(pd.to_numeric, errors='coerce')
+    # Get BST of each pokemon, left empty for Pokemon without stats
+    species['BST'] = species[STAT_COLUMNS].sum(axis=1, min_count=1)
+    species.index.name = 'Species ID'
+    return species_dtypes(species[['Name'] + SPECIES_COLUMNS])
+
+
+def main(incremental=False, offline=False, excel=False):
+    print("Running...")
+    triples = [(months, tier, ranking) for months in get_months_avaliable()
+               for tier in tier_list for ranking in ladder_ranking]
+
+    manifest = ScrapeManifest(MANIFEST_PATH)
+    df_existing = None
+    if incremental and (os.path.exists(USAGE_STORE_PATH) or os.path.exists(EXCEL_PATH)):
+        # Just the usage rows, species details are rebuilt below for every Pokemon in the merged dataset
+        df_existing = load_usage_tables()[0].drop(columns=['Species ID'], errors='ignore')
+        # First incremental run after a full scrape: seed the manifest from what's already in the dataset
+        if not len(manifest):
+            existing_triples = df_existing[['Month', 'Tier', 'Ranking']].drop_duplicates()
+            for months, tier, ranking in existing_triples.itertuples(index=False):
+                # The store labels Smogon's 0 ladder as 1000
+                manifest.mark_ingested(months.strftime('%Y-%m'), tier, '0' if ranking == 1000 else ranking)
+        triples = manifest.missing(triples)
+        print(f"Incremental mode: {len(triples)} files to fetch")
+        if not triples:
+            print("Dataset already up to date!")
+            return
+
+    fetcher = Fetcher(max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND,
+                      cache=ResponseCache(CACHE_DIR), offline=offline)
+    df_final = scrape_usage(triples, fetcher, manifest)
+    if df_final is None:
+        fetcher.close()
+        print("No new data scraped")
+        manifest.save()
+        return
+
+    df_final = prepare_usage_dtypes(clean_usage_rows(df_final))
+
+    if df_existing is not None:
+        # Merge the new months into the existing dataset, newer rows win if anything overlaps
+        df_final = pd.concat([df_existing, df_final], ignore_index=True)
+        df_final = df_final.drop_duplicates(subset=['Name', 'Tier', 'Month', 'Ranking'], keep='last')
+        df_final = prepare_usage_dtypes(df_final)
+
+    # Get pokemon stats from "list_of_pokemon_df.csv"
+    pokemon_stats = pd.read_csv("list_of_pokemon_df.csv")
+    # Narrow usage rows point into the species table by the Name category's code
+    species = build_species(df_final['Name'].cat.categories, get_sprite_links(fetcher), pokemon_stats)
+    df_final['Species ID'] = df_final['Name'].cat.codes.astype('int16')
+    # Local, pre-resized copies under assets/sprites/ for the app to serve instead of hotlinking
+    sprites_added = SpriteCache().update(species['Sprite Links'], fetcher)
+    print(f"Stored {sprites_added} new sprites")
+    fetcher.close()
+
+    write_usage_store(df_final, species=species)
+    df_wide = widen_usage(df_final, species)
+    write_insights(compute_insights(df_wide))
+    write_movers(compute_movers(df_final))
+    # Last, so app workers watching for a new version already see the matching insights and movers
+    write_shared_dataset(df_final, species.set_index('Name'))
+    if excel:
+        df_wide.to_excel(EXCEL_PATH)
+    manifest.save()
+    print("Data successfully scraped!")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape monthly Smogon usage stats")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only fetch (month, tier, rating) files that aren't already in the dataset")
+    parser.add_argument('--offline', action='store_true',
+                        help=f"Replay responses from {CACHE_DIR}/ instead of going to the network")
+    parser.add_argument('--excel', action='store_true',
+                        help=f"Also export the dataset to {EXCEL_PATH}")
+    args = parser.parse_args()
+    main(incremental=args.incremental, offline=args.offline, excel=args.excel)
@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+import plotly.express as px
+
+from data_store import STAT_COLUMNS
+
+
+class SpeciesIndex:
+    # Base stats for the stats box, built once per dataset from the species table (indexed by Name). A click is
+    # a dict lookup for the Pokemon's row in a stats array plus filling its values into a bar figure that was
+    # rendered once up front, every Pokemon's bars only differ in their heights.
+    def __init__(self, species):
+        self.ids = {name: i for i, name in enumerate(species.index)}
+        # NaN where a Pokemon has no stats
+        self.stats = species[STAT_COLUMNS].astype('float64').to_numpy()
+        self.types = species[['Type1', 'Type2']].astype(object).to_numpy()
+        self.bst = species['BST'].astype('float64').to_numpy()
+
+        fig = px.bar(x=STAT_COLUMNS, y=np.zeros(len(STAT_COLUMNS)), labels={'x': 'Stat', 'y': 'Value'},
+                     title='Stats')
+        fig.update_layout(template='plotly_dark', yaxis_title=None, xaxis_title=None, title="")
+        template = json.loads(fig.to_json())
+        self.bar_trace = template['data'][0]
+        self.bar_layout = template['layout']
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def stat_values(self, name):
+        # The six base stats in STAT_COLUMNS order (None where missing), or None for an unknown Pokemon
+        species_id = self.ids.get(name)
+        if species_id is None:
+            return None
+        return [None if np.isnan(value) else int(value) for value in self.stats[species_id]]
+
+    def details(self, name):
+        # Everything the stats box can show for one Pokemon, or None if it isn't in the species table
+        species_id = self.ids.get(name)
+        if species_id is None:
+            return None
+        bst = self.bst[species_id]
+        return {'Name': name, 'Type1': self.types[species_id][0], 'Type2': self.types[species_id][1],
+                'BST': None if np.isnan(bst) else int(bst),
+                **dict(zip(STAT_COLUMNS, self.stat_values(name)))}
+
+    def stats_figure(self, name):
+        # Bar chart of the base stats as a figure dict, or None for an unknown Pokemon
+        values = self.stat_values(name)
+        if values is None:
+            return None
+        return {'data': [{**self.bar_trace, 'y': values}], 'layout': self.bar_layout}
@@ -0,0 +1,72 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Spellings of the same Pokemon that species_key() can't line up on its own, by key
+ALIASES = {
+    'nidoranf': 'nidoran-f',
+    'nidoranm': 'nidoran-m',
+}
+
+
+@lru_cache(maxsize=None)
+def species_key(name):
+    # One spelling for a name from any of the sources: Smogon's "Urshifu-Rapid-Strike", "Farfetch’d" and
+    # "Mr. Mime", pokemondb's "Flabébé" and "Nidoran♀", the stats sheet's "farfetch'd" and "mr. mime" all come
+    # out lowercase ASCII with single dashes between words ("farfetchd", "mr-mime", "nidoran-f")
+    if not isinstance(name, str):
+        return None
+    name = name.replace('♀', '-f').replace('♂', '-m')
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower()
+    key = re.sub(r'[^a-z0-9]+', '-', name.replace("'", '')).strip('-')
+    return ALIASES.get(key, key) or None
+
+
+def base_keys(key):
+    # The key itself, then with its last dash-separated part dropped, and so on: "urshifu-rapid-strike",
+    # "urshifu-rapid", "urshifu". Forms a source doesn't list separately fall back to their base species.
+    parts = key.split('-')
+    return ['-'.join(parts[:i]) for i in range(len(parts), 0, -1)]
+
+
+class SpeciesResolver:
+    # Resolves names to rows of a reference table (pokemon stats, sprite links) by species_key(). The key to
+    # row table is built once, each distinct name is only resolved once, and a whole column is resolved with
+    # one pass over its distinct names, so joining on the result is a take by integer ID.
+    def __init__(self, names, fallback=True):
+        self.ids = {}
+        for i, key in enumerate(map(species_key, names)):
+            # The first row wins when a source lists the same species twice
+            if key is not None:
+                self.ids.setdefault(key, i)
+        self.fallback = fallback
+        self.cache = {}
+        # Names that only matched their base species, and ones that matched nothing
+        self.base_form = set()
+        self.unmapped = set()
+
+    def resolve_one(self, name):
+        if name in self.cache:
+            return self.cache[name]
+        key = species_key(name)
+        species_id = -1
+        if key is not None:
+            for candidate in base_keys(key) if self.fallback else [key]:
+                if candidate in self.ids:
+                    species_id = self.ids[candidate]
+                    if candidate != key:
+                        self.base_form.add(name)
+                    break
+        if species_id < 0:
+            self.unmapped.add(name)
+        self.cache[name] = species_id
+        return species_id
+
+    def resolve(self, names):
+        # Row in the reference table for every name, -1 where there is none
+        codes, uniques = pd.factorize(pd.Series(names), use_na_sentinel=True)
+        ids = np.array([self.resolve_one(name) for name in uniques], dtype=np.int64)
+        return np.where(codes >= 0, ids[codes], -1) if len(ids) else np.full(len(codes), -1)
@@ -0,0 +1,93 @@
+import hashlib
+import io
+import json
+import os
+
+from PIL import Image
+
+SPRITE_DIR = os.path.join('assets', 'sprites')
+# Dash serves everything under assets/ from here
+SPRITE_URL_PATH = '/assets/sprites/'
+# display_image shows sprites at 210x210
+SPRITE_SIZE = 210
+
+
+class SpriteCache:
+    # Local copies of the scraped sprite links under assets/sprites/. Each sprite is downloaded once, scaled to
+    # the size the app shows it at and stored under a hash of the result, so Pokemon (and forms) sharing a
+    # sprite share one file. index.json maps each source URL to its file.
+    def __init__(self, root=SPRITE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+
+    def __contains__(self, url):
+        return url in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def local_url(self, url):
+        # Where the browser should load a sprite from: the local copy if there is one, else the original link
+        name = self.index.get(url)
+        return SPRITE_URL_PATH + name if name else url
+
+    def add(self, url, body):
+        # Resizes and stores one downloaded sprite. Returns its file name, or None if body isn't an image.
+        try:
+            image = Image.open(io.BytesIO(body))
+            image.load()
+        except (OSError, Image.DecompressionBombError):
+            return None
+        image = image.convert('RGBA')
+
+        # Sprites are pixel art, nearest neighbour keeps them sharp. Centered on a transparent square so every
+        # sprite lines up the same way in the stats box.
+        scale = SPRITE_SIZE / max(image.size)
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                             Image.NEAREST)
+        canvas = Image.new('RGBA', (SPRITE_SIZE, SPRITE_SIZE), (0, 0, 0, 0))
+        canvas.paste(image, ((SPRITE_SIZE - image.width) // 2, (SPRITE_SIZE - image.height) // 2))
+        output = io.BytesIO()
+        canvas.save(output, 'PNG', optimize=True)
+        data = output.getvalue()
+
+        name = hashlib.sha256(data).hexdigest()[:16] + '.png'
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            os.makedirs(self.root, exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
+        self.index[url] = name
+        return name
+
+    def update(self, urls, fetcher):
+        # Downloads every sprite that isn't stored yet, returns how many were added
+        missing = [url for url in dict.fromkeys(urls) if isinstance(url, str) and url and url not in self.index]
+        added = 0
+        for url, body in fetcher.fetch_all(missing, decode=False):
+            if body is not None and self.add(url, body) is not None:
+                added += 1
+        self.prune()
+        self.save()
+        return added
+
+    def prune(self):
+        # Delete files no URL points to anymore
+        if not os.path.isdir(self.root):
+            return
+        used = set(self.index.values())
+        for name in os.listdir(self.root):
+            if name.endswith('.png') and name not in used:
+                os.remove(os.path.join(self.root, name))
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
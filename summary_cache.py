@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+
+class SummaryCache:
+    # Persistent cache of AI meta summaries keyed by a hash of the data month and the prompt, so identical
+    # requests don't spend API quota again. Entries expire after ttl seconds and the oldest are evicted past
+    # max_entries. Concurrent requests for the same key wait on a single in-flight model call. Other processes
+    # sharing the file (e.g. app workers) are picked up on a miss and merged in before saving.
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=500):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.entries = {}
+        self.loaded_stat = None
+        self.reload()
+
+    def reload(self):
+        # Merges in the file's entries if it changed since it was last read, the newer entry wins.
+        # Call with the lock held.
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        # Size as well, in case two saves land within the file system's timestamp resolution
+        if (stat.st_mtime_ns, stat.st_size) == self.loaded_stat:
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, entry in entries.items():
+            if key not in self.entries or entry['created'] > self.entries[key]['created']:
+                self.entries[key] = entry
+        self.loaded_stat = (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def make_key(prompt, month):
+        return hashlib.sha256(f"{month}\n{prompt}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.reload()
+            entry = self.entries.get(key)
+            if entry is None or time.time() - entry['created'] > self.ttl:
+                return None
+            return entry['text']
+
+    def put(self, key, text, month):
+        with self.lock:
+            self.reload()
+            self.entries[key] = {'text': text, 'month': month, 'created': time.time()}
+            now = time.time()
+            self.entries = {k: v for k, v in self.entries.items() if now - v['created'] <= self.ttl}
+            if len(self.entries) > self.max_entries:
+                newest = sorted(self.entries, key=lambda k: self.entries[k]['created'])[-self.max_entries:]
+                self.entries = {k: self.entries[k] for k in newest}
+            self.save()
+
+    def save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        self.loaded_stat = (stat.st_mtime_ns, stat.st_size)
+
+    def get_or_generate(self, prompt, month, generate):
+        # generate(prompt) is only called on a miss, and only by the first of any concurrent callers.
+        # Failures aren't cached, every waiting caller gets the same exception.
+        key = self.make_key(prompt, month)
+        text = self.get(key)
+        if text is not None:
+            return text
+
+        with self.lock:
+            pending = self.in_flight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self.in_flight[key] = Future()
+        if not leader:
+            return pending.result()
+
+        try:
+            text = generate(prompt)
+            self.put(key, text, month)
+            pending.set_result(text)
+            return text
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from background_jobs import BackgroundJobs, QueueFull
+
+
+def wait_finished(jobs, job_id):
+    # Polls until the job is no longer pending instead of sleeping a fixed time a loaded machine may need more of
+    deadline = time.monotonic() + 5
+    while jobs.poll(job_id)[0] == 'pending' and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_every_client_gets_the_result():
+    jobs = BackgroundJobs()
+    release = threading.Event()
+    jobs.submit('key', lambda: release.wait(5) and 'summary')
+    # A second client asking for the same key joins the job
+    jobs.submit('key', lambda: 'not run')
+    assert jobs.poll('key') == ('pending', None)
+    release.set()
+    wait_finished(jobs, 'key')
+    # Collecting the result doesn't take it away from the other client
+    assert jobs.poll('key') == ('done', 'summary')
+    jobs.release('key')
+    assert jobs.poll('key') == ('done', 'summary')
+    jobs.release('key')
+    assert jobs.poll('key') == ('missing', None)
+
+
+def test_one_client_leaving_keeps_the_job():
+    jobs = BackgroundJobs(max_workers=1)
+    release = threading.Event()
+    jobs.submit('busy', lambda: release.wait(5))
+    ran = []
+    jobs.submit('key', lambda: ran.append(1))
+    jobs.submit('key', lambda: ran.append(2))
+    jobs.release('key')
+    assert jobs.poll('key') == ('pending', None)
+    # The last client leaving drops it, and a job that hasn't started never runs
+    jobs.release('key')
+    assert jobs.poll('key') == ('missing', None)
+    release.set()
+    time.sleep(0.1)
+    assert ran == []
+
+
+def test_error_and_timeout():
+    jobs = BackgroundJobs(timeout=0.2)
+    jobs.submit('broken', lambda: 1 / 0)
+    wait_finished(jobs, 'broken')
+    status, error = jobs.poll('broken')
+    assert status == 'error' and isinstance(error, ZeroDivisionError)
+    release = threading.Event()
+    jobs.submit('slow', lambda: release.wait(5))
+    time.sleep(0.3)
+    assert jobs.poll('slow') == ('timeout', None)
+    release.set()
+
+
+def test_queue_full():
+    jobs = BackgroundJobs(max_workers=1, max_pending=2)
+    release = threading.Event()
+    jobs.submit('a', lambda: release.wait(5))
+    jobs.submit('b', lambda: release.wait(5))
+    with pytest.raises(QueueFull):
+        jobs.submit('c', lambda: None)
+    # Joining a job that is already waiting doesn't need room
+    jobs.submit('b', lambda: None)
+    release.set()
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetcher import Fetcher, RateLimiter
+
+
+class StubSmogonHandler(BaseHTTPRequestHandler):
+    # Answers by the last part of the path: 'ok' with 200, 'flaky' with 503 until the third request, 'limited'
+    # with 429 once, 'broken' always with 500 and anything else with 404. Every request is logged.
+    requests = None
+    lock = threading.Lock()
+
+    def do_GET(self):
+        name = self.path.rsplit('/', 1)[-1]
+        with self.lock:
+            self.requests.append((name, time.monotonic()))
+            seen = sum(1 for logged, _ in self.requests if logged == name)
+        if name.startswith('ok') or (name == 'flaky' and seen >= 3) or (name == 'limited' and seen >= 2):
+            body = name.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if name == 'flaky':
+            self.send_response(503)
+        elif name == 'limited':
+            self.send_response(429)
+        elif name == 'broken':
+            self.send_response(500)
+        else:
+            self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    handler = type('Handler', (StubSmogonHandler,), {'requests': []})
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", handler.requests
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_fetcher(**kwargs):
+    return Fetcher(**{'max_workers': 4, 'rate': 0, 'retries': 3, 'backoff': 0.01, 'timeout': 5, **kwargs})
+
+
+def test_retries_503_until_success(server):
+    base, requests = server
+    fetcher = make_fetcher()
+    assert fetcher.fetch(f"{base}/stats/flaky") == 'flaky'
+    assert Counter(name for name, _ in requests)['flaky'] == 3
+
+
+def test_retries_429(server):
+    base, requests = server
+    assert make_fetcher().fetch(f"{base}/stats/limited") == 'limited'
+    assert Counter(name for name, _ in requests)['limited'] == 2
+
+
+def test_persistent_500_gives_none(server):
+    base, requests = server
+    fetcher = make_fetcher(retries=2)
+    assert fetcher.fetch(f"{base}/stats/broken") is None
+    assert Counter(name for name, _ in requests)['broken'] == 3
+    assert f"{base}/stats/broken" not in fetcher.not_found
+
+
+def test_backoff_between_retries(server):
+    base, requests = server
+    make_fetcher(retries=2, backoff=0.1).fetch(f"{base}/stats/broken")
+    times = [at for _, at in requests]
+    # 0.1s then 0.2s
+    assert times[1] - times[0] >= 0.09
+    assert times[2] - times[1] >= 0.19
+
+
+def test_404_is_final(server):
+    base, requests = server
+    fetcher = make_fetcher()
+    assert fetcher.fetch(f"{base}/stats/missing") is None
+    assert len(requests) == 1
+    assert f"{base}/stats/missing" in fetcher.not_found
+
+
+def test_rate_limit_holds_across_workers(server):
+    base, requests = server
+    rate = 20.0
+    fetcher = make_fetcher(max_workers=8, rate=rate)
+    urls = [f"{base}/stats/ok{i}" for i in range(12)]
+    results = dict(fetcher.fetch_all(urls))
+    assert results == {url: url.rsplit('/', 1)[-1] for url in urls}
+    times = sorted(at for _, at in requests)
+    # Slots are handed out 1/rate apart, so the i-th request can't arrive before i slots have passed. One slot
+    # is allowed for a thread that got its slot but was scheduled late, which makes the ones after it look early.
+    assert all(at - times[0] >= (i - 1) / rate for i, at in enumerate(times))
+    assert times[-1] - times[0] >= (len(urls) - 2) / rate
+
+
+def test_rate_limiter_spaces_slots_per_host():
+    limiter = RateLimiter(50)
+    begin = time.monotonic()
+    for _ in range(6):
+        limiter.wait('smogon.com')
+    limiter.wait('pokemondb.net')
+    assert time.monotonic() - begin >= 5 * 0.9 / 50
+
+
+def test_fetch_all_keeps_a_bounded_window(server):
+    base, requests = server
+    fetcher = make_fetcher(max_workers=2, rate=0)
+    urls = (f"{base}/stats/ok{i}" for i in range(20))
+    downloads = fetcher.fetch_all(urls, window=4)
+    # A caller that hasn't read anything past the first file only holds up the window, in order
+    assert next(downloads) == (f"{base}/stats/ok0", 'ok0')
+    time.sleep(0.3)
+    assert len(requests) <= 4
+    assert [text for _, text in downloads] == [f'ok{i}' for i in range(1, 20)]
+    assert len(requests) == 20
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from movers import compute_movers, index_movers
+
+
+def usage_frame(rows, tier='gen9ou', ranking=1500):
+    df = pd.DataFrame(rows, columns=['Name', 'Month', 'Usage Rate', 'Rank'])
+    df['Month'] = pd.to_datetime(df['Month'])
+    df['Tier'] = tier
+    df['Ranking'] = ranking
+    return df
+
+
+@pytest.fixture
+def movers():
+    # Kingambit banned in February and back in March, April never scraped, Gholdengo new in May
+    return compute_movers(usage_frame([
+        ('Great Tusk', '2024-01-01', 10.0, 1), ('Kingambit', '2024-01-01', 5.0, 2),
+        ('Great Tusk', '2024-02-01', 20.0, 1),
+        ('Great Tusk', '2024-03-01', 30.0, 1), ('Kingambit', '2024-03-01', 7.0, 2),
+        ('Great Tusk', '2024-05-01', 40.0, 2), ('Gholdengo', '2024-05-01', 50.0, 1),
+    ]))
+
+
+def row(movers, name, month):
+    rows = movers[(movers['Name'] == name) & (movers['Month'] == pd.Timestamp(month))]
+    assert len(rows) == 1
+    return rows.iloc[0]
+
+
+def test_first_month_has_no_changes(movers):
+    january = movers[movers['Month'] == pd.Timestamp('2024-01-01')]
+    assert (january['Status'] == '').all()
+    assert january['Previous Usage'].isna().all()
+    assert january['Usage Change'].isna().all()
+    assert january['Rank Change'].isna().all()
+
+
+def test_ban_and_reentry(movers):
+    banned = row(movers, 'Kingambit', '2024-02-01')
+    assert banned['Status'] == 'exited'
+    assert banned['Usage Rate'] == 0 and banned['Previous Usage'] == 5
+    assert banned['Usage Change'] == -5 and banned['Previous Rank'] == 2
+    back = row(movers, 'Kingambit', '2024-03-01')
+    assert back['Status'] == 'entered'
+    assert back['Previous Usage'] == 0 and back['Usage Change'] == 7
+    assert row(movers, 'Great Tusk', '2024-02-01')['Status'] == ''
+    assert row(movers, 'Great Tusk', '2024-03-01')['Usage Change'] == 10
+
+
+def test_month_after_a_skipped_month(movers):
+    # April wasn't scraped, so May has nothing to compare with: no statuses, no changes and no exits
+    may = movers[movers['Month'] == pd.Timestamp('2024-05-01')]
+    assert sorted(may['Name']) == ['Gholdengo', 'Great Tusk']
+    assert (may['Status'] == '').all()
+    assert may['Usage Change'].isna().all()
+
+
+def test_trend_averages_the_last_three_months(movers):
+    # Month starts within 80 days: Kingambit in March covers its -5 in February and +7 in March
+    assert row(movers, 'Kingambit', '2024-03-01')['Trend'] == pytest.approx(2 / 3)
+    assert row(movers, 'Great Tusk', '2024-03-01')['Trend'] == pytest.approx(20 / 3)
+
+    steady = compute_movers(usage_frame([('Great Tusk', f'2024-{month:02}-01', usage, 1)
+                                         for month, usage in enumerate([10.0, 11.0, 13.0, 16.0, 20.0], start=1)]))
+    # May's window is March, April and May (+2, +3, +4), February's +1 has dropped out
+    assert row(steady, 'Great Tusk', '2024-05-01')['Trend'] == pytest.approx(3.0)
+    assert np.isnan(row(steady, 'Great Tusk', '2024-01-01')['Trend'])
+
+
+def test_index_movers(movers):
+    index = index_movers(movers)
+    march = index[('gen9ou', 1500, pd.Timestamp('2024-03-01'))]
+    # Most used first
+    assert march['Name'].tolist() == ['Great Tusk', 'Kingambit']
+    assert ('gen9ou', 1500, pd.Timestamp('2024-04-01')) not in index
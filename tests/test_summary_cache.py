@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from summary_cache import SummaryCache
+
+
+class StubModel:
+    # Stands in for the Gemini client: generate_content(prompt).text, counting calls. Holds every call until
+    # release is set so tests can line up concurrent requests.
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def generate(self, prompt):
+        self.calls += 1
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("quota exceeded")
+        return f"SUMMARY {prompt}"
+
+
+def test_cached_after_first_call(tmp_path):
+    model = StubModel()
+    cache = SummaryCache(str(tmp_path / 'summary_cache.json'))
+    assert cache.get_or_generate('prompt', '2024-09', model.generate) == 'SUMMARY prompt'
+    assert cache.get_or_generate('prompt', '2024-09', model.generate) == 'SUMMARY prompt'
+    assert model.calls == 1
+    # A new data month is a different summary
+    cache.get_or_generate('prompt', '2024-10', model.generate)
+    assert model.calls == 2
+
+
+def test_persisted_to_disk(tmp_path):
+    path = str(tmp_path / 'summary_cache.json')
+    SummaryCache(path).get_or_generate('prompt', '2024-09', StubModel().generate)
+    reloaded = SummaryCache(path)
+    assert reloaded.get(reloaded.make_key('prompt', '2024-09')) == 'SUMMARY prompt'
+
+
+def test_concurrent_callers_share_one_call(tmp_path):
+    model = StubModel()
+    model.release.clear()
+    cache = SummaryCache(str(tmp_path / 'summary_cache.json'))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_generate('prompt', '2024-09', model.generate)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while not cache.in_flight:
+        pass
+    model.release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ['SUMMARY prompt'] * 5
+    assert model.calls == 1
+
+
+def test_failures_are_not_cached(tmp_path):
+    model = StubModel(fail=True)
+    cache = SummaryCache(str(tmp_path / 'summary_cache.json'))
+    with pytest.raises(RuntimeError):
+        cache.get_or_generate('prompt', '2024-09', model.generate)
+    model.fail = False
+    assert cache.get_or_generate('prompt', '2024-09', model.generate) == 'SUMMARY prompt'
+    assert model.calls == 2
+
+
+def test_expired_entries_are_regenerated(tmp_path):
+    model = StubModel()
+    cache = SummaryCache(str(tmp_path / 'summary_cache.json'), ttl=0)
+    cache.get_or_generate('prompt', '2024-09', model.generate)
+    cache.get_or_generate('prompt', '2024-09', model.generate)
+    assert model.calls == 2
+
+
+def test_sees_other_workers_entries(tmp_path):
+    # Two workers sharing the file: each finds the other's summaries and saving doesn't drop them
+    path = str(tmp_path / 'summary_cache.json')
+    first, second = SummaryCache(path), SummaryCache(path)
+    first.get_or_generate('prompt', '2024-09', StubModel().generate)
+    assert second.get(second.make_key('prompt', '2024-09')) == 'SUMMARY prompt'
+    second.get_or_generate('other', '2024-09', StubModel().generate)
+    reloaded = SummaryCache(path)
+    assert reloaded.get(reloaded.make_key('prompt', '2024-09')) == 'SUMMARY prompt'
+    assert reloaded.get(reloaded.make_key('other', '2024-09')) == 'SUMMARY other'
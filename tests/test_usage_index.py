@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from usage_index import fill_missing_months
+
+
+def fill_missing_months_baseline(df, top_n_array):
+    # app.py's fill_missing_months before it was vectorized, verbatim
+    df['Month'] = pd.to_datetime(df['Month'])
+    all_months = pd.date_range(df['Month'].min(), df['Month'].max(), freq='MS')
+    result = []
+    for name in top_n_array:
+        group = df[df['Name'] == name].set_index('Month').reindex(all_months, fill_value=0).reset_index()
+        group['Name'] = name
+        # Copy over other columns if needed (e.g., 'Sprite Links')
+        for col in ['Sprite Links', 'Ranking', 'Tier']:
+            if col in df.columns:
+                group[col] = df[df['Name'] == name][col].iloc[0] if not df[df['Name'] == name][col].empty else None
+        result.append(group)
+    df_filled = pd.concat(result)
+    df_filled.rename(columns={'index': 'Month'}, inplace=True)
+    return df_filled
+
+
+def usage_rows():
+    # Great Tusk every month, Kingambit banned in March, Gholdengo only from April on
+    rows = [
+        ('Great Tusk', '2024-01-01', 30.5, 1), ('Kingambit', '2024-01-01', 25.0, 2),
+        ('Great Tusk', '2024-02-01', 31.0, 1), ('Kingambit', '2024-02-01', 24.0, 2),
+        ('Great Tusk', '2024-03-01', 29.0, 1),
+        ('Great Tusk', '2024-04-01', 28.0, 2), ('Kingambit', '2024-04-01', 20.0, 3),
+        ('Gholdengo', '2024-04-01', 35.0, 1),
+    ]
+    df = pd.DataFrame(rows, columns=['Name', 'Month', 'Usage Rate', 'Rank'])
+    df['Month'] = pd.to_datetime(df['Month'])
+    df['Tier'] = 'gen9ou'
+    df['Ranking'] = 1500
+    df['Sprite Links'] = 'https://img/' + df['Name'] + '.png'
+    return df
+
+
+@pytest.mark.parametrize('top_n_array', [['Gholdengo', 'Great Tusk', 'Kingambit'], ['Kingambit'], ['Great Tusk']])
+def test_same_output_as_the_baseline_loop(top_n_array):
+    expected = fill_missing_months_baseline(usage_rows(), top_n_array).reset_index(drop=True)
+    filled = fill_missing_months(usage_rows(), top_n_array).reset_index(drop=True)
+    pd.testing.assert_frame_equal(filled, expected)
+
+
+def test_fills_gaps_with_zero_usage():
+    filled = fill_missing_months(usage_rows(), ['Kingambit', 'Gholdengo'])
+    kingambit = filled[filled['Name'] == 'Kingambit'].set_index('Month')
+    assert kingambit['Usage Rate'].tolist() == [25.0, 24.0, 0.0, 20.0]
+    # The banned month keeps the Pokemon's tier and sprite instead of 0
+    assert kingambit.loc['2024-03-01', 'Tier'] == 'gen9ou'
+    assert kingambit.loc['2024-03-01', 'Sprite Links'] == 'https://img/Kingambit.png'
+    gholdengo = filled[filled['Name'] == 'Gholdengo']
+    assert gholdengo['Usage Rate'].tolist() == [0.0, 0.0, 0.0, 35.0]
+
+
+def test_categorical_columns():
+    # The app keeps Name, Tier and Sprite Links as categoricals, the baseline only handled object columns
+    df = usage_rows()
+    categorical = df.astype({'Name': 'category', 'Tier': 'category', 'Sprite Links': 'category'})
+    pd.testing.assert_frame_equal(fill_missing_months(categorical, ['Great Tusk', 'Kingambit']),
+                                  fill_missing_months(df, ['Great Tusk', 'Kingambit']))
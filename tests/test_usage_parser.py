@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from usage_parser import UsageFormatError, parse_usage_text
+
+HEADER = """ Total battles: 123456
+ Avg. weight/team: 0.123
+ + ---- + ------------------ + --------- + ------ + ------- + ------ + ------- + 
+ | Rank | Pokemon            | Usage %   | Raw    | %       | Real   | %       | 
+ + ---- + ------------------ + --------- + ------ + ------- + ------ + ------- + 
+"""
+BORDER = " + ---- + ------------------ + --------- + ------ + ------- + ------ + ------- + \n"
+
+
+def usage_file(*rows):
+    return HEADER + ''.join(rows) + BORDER
+
+
+def test_parses_rows():
+    df = parse_usage_text(usage_file(
+        " | 1    | Great Tusk         | 35.12345% | 3000   | 30.000% | 2700   | 31.000% | \n",
+        " | 2    | Urshifu-Rapid-Strike | 9.50000% | 950   | 9.500%  | 900    | 9.000%  | \n"))
+    assert df.columns.tolist() == ['Rank', 'Name', 'Usage Rate', 'Raw Usage', 'Raw %']
+    assert df['Rank'].tolist() == [1, 2]
+    assert df['Name'].tolist() == ['Great Tusk', 'Urshifu-Rapid-Strike']
+    np.testing.assert_allclose(df['Usage Rate'], [35.12345, 9.5])
+    assert df['Raw Usage'].tolist() == [3000, 950]
+    np.testing.assert_allclose(df['Raw %'], [30.0, 9.5])
+    assert df['Rank'].dtype == np.int64 and df['Usage Rate'].dtype == np.float64
+
+
+def test_empty_table():
+    df = parse_usage_text(usage_file())
+    assert df.empty
+    assert df.columns.tolist() == ['Rank', 'Name', 'Usage Rate', 'Raw Usage', 'Raw %']
+
+
+def test_no_table():
+    with pytest.raises(UsageFormatError, match="no usage table"):
+        parse_usage_text("<html>Not Found</html>\n")
+
+
+def test_header_mismatch():
+    text = usage_file(" | 1    | Great Tusk         | 35.12345% | 3000   | 30.000% | 2700   | 31.000% | \n")
+    with pytest.raises(UsageFormatError, match="unexpected header"):
+        parse_usage_text(text.replace("| Raw    |", "| Count  |"))
+
+
+def test_short_row():
+    text = usage_file(" | 1    | Great Tusk         | 35.12345% | 3000   | 30.000% | 2700   | 31.000% | \n",
+                      " | 2    | Kingambit          | 20.00000% | 2000   | 20.000% | \n")
+    with pytest.raises(UsageFormatError, match="line 7 has 5 columns instead of 7"):
+        parse_usage_text(text)
+
+
+def test_bad_number():
+    with pytest.raises(UsageFormatError, match="bad number"):
+        parse_usage_text(usage_file(
+            " | 1    | Great Tusk         | n/a       | 3000   | 30.000% | 2700   | 31.000% | \n"))
@@ -0,0 +1,122 @@
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import pandas as pd
+
+
+class UsageIndex:
+    # Splits df_final into one frame per (Tier, Ranking) once at startup so the callbacks don't have to
+    # boolean-scan the whole dataset on every dropdown change. Each partition is sorted by Month and then
+    # by Usage Rate (highest first), and remembers where every month starts and stops, so getting a month's
+    # top N is a dict lookup plus a slice.
+    def __init__(self, df):
+        self.partitions = {}
+        self.month_bounds = {}
+        df = self.sort(df)
+        tiers = pd.factorize(df['Tier'])[0]
+        rankings = df['Ranking'].to_numpy()
+        months = df['Month'].to_numpy()
+        # Each partition is a contiguous slice of df, a view rather than a copy
+        partition_change = (tiers[1:] != tiers[:-1]) | (rankings[1:] != rankings[:-1])
+        starts = np.flatnonzero(np.r_[True, partition_change])
+        stops = np.r_[starts[1:], len(df)]
+        for start, stop in zip(starts, stops):
+            key = (df['Tier'].iat[start], int(rankings[start]))
+            self.partitions[key] = df.iloc[start:stop]
+
+            part_months = months[start:stop]
+            month_starts = np.flatnonzero(np.r_[True, part_months[1:] != part_months[:-1]])
+            month_stops = np.r_[month_starts[1:], len(part_months)]
+            self.month_bounds[key] = {pd.Timestamp(part_months[month_start]): (month_start, month_stop)
+                                      for month_start, month_stop in zip(month_starts, month_stops)}
+
+    @staticmethod
+    def sort(df):
+        # Tier, Ranking, Month, then Usage Rate from highest to lowest. Data that's already in this order, like
+        # the memory-mapped shared dataset, is used as is so the partitions stay views of it.
+        order = np.lexsort((-df['Usage Rate'].to_numpy(), df['Month'].to_numpy(), df['Ranking'].to_numpy(),
+                            pd.factorize(df['Tier'], sort=True)[0]))
+        if (order == np.arange(len(order))).all():
+            return df
+        return df.take(order).reset_index(drop=True)
+
+    def get(self, tier, ranking):
+        # Every month for the tier/ranking, or None if it wasn't scraped
+        return self.partitions.get((tier, ranking))
+
+    def months(self, tier, ranking):
+        return list(self.month_bounds.get((tier, ranking), {}))
+
+    def latest_month(self, tier, ranking):
+        months = self.months(tier, ranking)
+        return months[-1] if months else None
+
+    def month(self, tier, ranking, month):
+        # One month's rows, already sorted from highest to lowest usage
+        bounds = self.month_bounds.get((tier, ranking), {}).get(pd.Timestamp(month))
+        if bounds is None:
+            return None
+        return self.partitions[(tier, ranking)].iloc[bounds[0]:bounds[1]]
+
+    def window(self, tier, ranking, start=None, end=None):
+        # Rows for the months from start to end, both included and either one left open, still sorted by Month
+        # and Usage Rate. A slice of the partition, found by bisecting its month list.
+        part = self.get(tier, ranking)
+        if part is None:
+            return None
+        months = self.months(tier, ranking)
+        first = bisect_left(months, pd.Timestamp(start)) if start is not None else 0
+        last = bisect_right(months, pd.Timestamp(end)) if end is not None else len(months)
+        if first >= last:
+            return part.iloc[0:0]
+        bounds = self.month_bounds[(tier, ranking)]
+        return part.iloc[bounds[months[first]][0]:bounds[months[last - 1]][1]]
+
+    def top_n(self, tier, ranking, n, month=None):
+        if month is None:
+            month = self.latest_month(tier, ranking)
+        rows = self.month(tier, ranking, month)
+        return rows.head(n) if rows is not None else None
+
+
+def fill_missing_months(df, top_n_array):
+    # Gives every Pokemon in top_n_array a row for every month, with 0 usage for months it was banned or unused.
+    # Builds the whole Name x Month grid with one MultiIndex reindex instead of filtering df per Pokemon.
+    # Categorical columns can't take the 0 fill value
+    df = df.astype({col: object for col in df.select_dtypes('category').columns})
+    df['Month'] = pd.to_datetime(df['Month'])
+    all_months = pd.date_range(df['Month'].min(), df['Month'].max(), freq='MS')
+    grid = pd.MultiIndex.from_product([list(top_n_array), all_months], names=['Name', 'Month'])
+    df_filled = df.set_index(['Name', 'Month']).reindex(grid, fill_value=0).reset_index()
+
+    # Filled months take these columns from the Pokemon's first row instead of 0 (e.g., 'Sprite Links')
+    first_rows = df.drop_duplicates(subset='Name').set_index('Name')
+    for col in ['Sprite Links', 'Ranking', 'Tier']:
+        if col in df.columns:
+            df_filled[col] = df_filled['Name'].map(first_rows[col])
+    return df_filled[df.columns.drop('Month').insert(0, 'Month')]
+
+
+# Views of the line graph besides one point per month
+AGGREGATIONS = {'quarter': 'Quarterly Average', 'rolling': '3-Month Rolling Average', 'envelope': 'Quarterly Range'}
+ROLLING_MONTHS = 3
+
+
+def aggregate_usage(df, aggregation):
+    # Takes fill_missing_months() output (one row per Pokemon and month, each Pokemon's rows together in month
+    # order) and returns it in the given view. 'quarter' averages each quarter into one point on its first month,
+    # 'envelope' does the same and adds each quarter's lowest and highest month as Usage Min / Usage Max.
+    if aggregation == 'rolling':
+        df = df.copy()
+        rolling = df.groupby('Name', sort=False)['Usage Rate'].rolling(ROLLING_MONTHS, min_periods=1).mean()
+        df['Usage Rate'] = rolling.reset_index(level=0, drop=True)
+        return df
+    if aggregation not in ('quarter', 'envelope'):
+        return df
+    quarters = df['Month'].dt.to_period('Q').dt.start_time.rename('Month')
+    usage = df.groupby([df['Name'], quarters], sort=False)['Usage Rate']
+    aggregated = usage.mean().to_frame()
+    if aggregation == 'envelope':
+        aggregated['Usage Min'] = usage.min()
+        aggregated['Usage Max'] = usage.max()
+    return aggregated.reset_index()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+# Column titles of the table in https://www.smogon.com/stats/<month>/<tier>-<rating>.txt
+USAGE_HEADER = ['Rank', 'Pokemon', 'Usage %', 'Raw', '%', 'Real', '%']
+# A table line split on '|' has a piece before the first bar and after the last one
+USAGE_FIELDS = len(USAGE_HEADER) + 2
+
+
+class UsageFormatError(ValueError):
+    pass
+
+
+def parse_usage_text(text):
+    # Turns a usage file into the scraper's columns in one pass over its lines: Rank, Name, Usage Rate, Raw Usage
+    # and Raw %, already typed. The Real columns aren't kept. Raises UsageFormatError if the table doesn't have
+    # the expected header, or a row doesn't have every column.
+    lines = text.splitlines()
+    header_index = next((i for i, line in enumerate(lines) if line.lstrip().startswith('|')), None)
+    if header_index is None:
+        raise UsageFormatError("no usage table found")
+    header = [title.strip() for title in lines[header_index].split('|')[1:-1]]
+    if header != USAGE_HEADER:
+        raise UsageFormatError(f"unexpected header {header}")
+
+    ranks, names, usage, raw, raw_percent = [], [], [], [], []
+    for number, line in enumerate(lines[header_index + 1:], start=header_index + 2):
+        line = line.strip()
+        # Border lines above the first row and below the last one
+        if not line or line.startswith('+'):
+            continue
+        fields = line.split('|')
+        if len(fields) != USAGE_FIELDS:
+            raise UsageFormatError(f"line {number} has {len(fields) - 2} columns instead of {len(USAGE_HEADER)}")
+        ranks.append(fields[1])
+        names.append(fields[2].strip())
+        usage.append(fields[3].strip().rstrip('%'))
+        raw.append(fields[4])
+        raw_percent.append(fields[5].strip().rstrip('%'))
+
+    try:
+        return pd.DataFrame({
+            'Rank': np.array(ranks, dtype=np.int64),
+            'Name': names,
+            'Usage Rate': np.array(usage, dtype=np.float64),
+            'Raw Usage': np.array(raw, dtype=np.int64),
+            'Raw %': np.array(raw_percent, dtype=np.float64),
+        })
+    except ValueError as e:
+        raise UsageFormatError(f"bad number in usage table: {e}") from None